@@ -0,0 +1,86 @@
+# Helpers for the versioned JSON API (/api/v1): encoding, field projection, opaque cursors
+import base64
+import binascii
+import hashlib
+import json
+
+try:
+    import orjson
+except Exception:  # optional: the stdlib encoder is used without it
+    orjson = None
+
+from database import University
+
+# Fields a client may ask for; `fields=` omitted means all of them
+FIELDS = University.FIELDS + ("photo_url",)
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+# Slugs per /api/universities/batch call; a whole favorites list fits (users.MAX_FAVORITES)
+MAX_BATCH = 200
+
+
+class CursorError(ValueError):
+    """Malformed cursor, or one issued for a different query."""
+
+
+class CursorExpired(CursorError):
+    """The catalog was reloaded since the cursor was issued; offsets no longer line up."""
+
+
+def dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def parse_fields(value: str):
+    """`fields=slug,name` -> ("slug", "name"); unknown names raise ValueError."""
+    if not value:
+        return FIELDS
+    fields = tuple(dict.fromkeys(f.strip() for f in value.split(",") if f.strip()))
+    unknown = [f for f in fields if f not in FIELDS]
+    if unknown or not fields:
+        raise ValueError(f"unknown fields: {', '.join(unknown)}; allowed: {', '.join(FIELDS)}")
+    return fields
+
+
+def project(u: University, fields) -> dict:
+    return {f: getattr(u, f) for f in fields}
+
+
+def parse_slugs(value: str):
+    """`slugs=a,b,a` -> ("a", "b"); more than MAX_BATCH raises ValueError."""
+    slugs = tuple(dict.fromkeys(s.strip() for s in (value or "").split(",") if s.strip()))
+    if len(slugs) > MAX_BATCH:
+        raise ValueError(f"at most {MAX_BATCH} slugs per request")
+    return slugs
+
+
+def card(u: University) -> dict:
+    # What a favorites card renders: local image copy plus its srcset data
+    return {"slug": u.slug, "name": u.name, "city": u.city,
+            "image": u.local_image, "image_set": u.local_image_set}
+
+
+def _query_tag(query) -> str:
+    return hashlib.blake2b(repr(query).encode(), digest_size=6).hexdigest()
+
+
+def encode_cursor(version: str, query, offset: int) -> str:
+    raw = f"{offset}.{version}.{_query_tag(query)}".encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str, version: str, query) -> int:
+    """Offset for `cursor`, which must come from the same query and catalog version."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        offset, cursor_version, tag = raw.split(".")
+        offset = int(offset)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise CursorError("invalid cursor")
+    if offset < 0 or tag != _query_tag(query):
+        raise CursorError("cursor does not belong to this query")
+    if cursor_version != version:
+        raise CursorExpired("catalog changed since this cursor was issued; start again without a cursor")
+    return offset
@@ -1,91 +1,74 @@
+import boot  # first, so the startup clock covers every import below
 from fastapi import FastAPI, Request, Query, HTTPException
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
-from fastapi.staticfiles import StaticFiles
-from database import get_universities_by_city, get_university_by_slug, get_programs_by_city, get_cities
-from database import universities as ALL_UNIS
+from jinja2 import FileSystemBytecodeCache
+import hashlib
 import os
-from pathlib import Path
-import threading
-try:
-    import requests
-    from requests.exceptions import RequestException
-except Exception:  # Fallback so the app still runs without requests
-    requests = None
-    class RequestException(Exception):
-        pass
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import asynccontextmanager
 from starlette.middleware.trustedhost import TrustedHostMiddleware
 from starlette.middleware.cors import CORSMiddleware
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import PlainTextResponse
-import time
-from collections import defaultdict, deque
-# Pydantic email validation: fall back to plain str if email-validator not installed
-try:
-    import email_validator  # noqa: F401
-    from pydantic import BaseModel, EmailStr, Field
-except Exception:
-    from pydantic import BaseModel, Field
-    EmailStr = str  # type: ignore
+from starlette.responses import PlainTextResponse, Response
+from pydantic import BaseModel, Field
 from typing import List, Optional
-import secrets, json
+from urllib.parse import urlencode
+boot.mark("framework")
+from database import catalog, catalog_manager
+boot.mark("catalog")
+from images import image_manifest
+from assets import AssetFiles, assets
+boot.mark("static scan")
+from pagecache import PageCache
+from imagesync import ImageSync, SYNC_DELAY
+from derivatives import CARD_SIZES, DETAIL_SIZES
+from ratelimit import make_backend
+from middleware import SecurityHeadersMiddleware, RateLimitMiddleware, CompressionMiddleware, MetricsMiddleware
+import metrics
+from sessions import make_session_store, SESSION_TTL
+from users import make_user_repository
+from passwords import hasher, PasswordPoolBusy
+from submissions import SubmissionSink
+import api
+boot.mark("app modules")
+
+image_sync = ImageSync()
+# Fetch images for universities added by a catalog reload
+catalog_manager.subscribe(lambda cat: image_sync.start_background(cat.records))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Image sync runs in the background once the worker is up; only one worker per host wins its lock
+    image_sync.start_background(catalog().records, delay=SYNC_DELAY)
+    image_manifest.start_watcher()
+    catalog_manager.start_watcher()
+    boot.mark("lifespan")
+    boot.report()
+    yield
+    catalog_manager.stop_watcher()
+    image_sync.stop()
+    image_manifest.stop_watcher()
+    submission_sink.close()
+    hasher.shutdown()
+
 
 # Initialize the FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Set up templates and static files
 templates = Jinja2Templates(directory="templates")
-app.mount("/static", StaticFiles(directory="static"), name="static")
+templates.env.globals.update(card_sizes=CARD_SIZES, detail_sizes=DETAIL_SIZES, asset_url=assets.url)
+# Compile every template now instead of on each worker's first hit; the bytecode
+# cache (TEMPLATE_CACHE_DIR, default a per-user temp dir) lets later boots skip compiling
+templates.env.bytecode_cache = FileSystemBytecodeCache(os.getenv("TEMPLATE_CACHE_DIR") or None)
+for _name in templates.env.list_templates():
+    templates.env.get_template(_name)
+boot.mark("templates")
+# Fingerprinted names (asset_url) are served immutable; see assets.py
+app.mount("/static", AssetFiles(directory="static", manifest=assets), name="static")
 
 # --- Basic security middleware ---
 
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request, call_next):
-        response = await call_next(request)
-        # Security headers (basic starter set)
-        response.headers.setdefault("X-Content-Type-Options", "nosniff")
-        response.headers.setdefault("X-Frame-Options", "DENY")
-        response.headers.setdefault("Referrer-Policy", "no-referrer-when-downgrade")
-        # CSP allows our domain, Bootstrap CDN, and HTTPS images
-        csp = (
-            "default-src 'self'; "
-            "img-src 'self' data: https:; "
-            "style-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net; "
-            "script-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net; "
-            "font-src 'self' data: https://cdn.jsdelivr.net; "
-            "object-src 'none'; frame-ancestors 'none'"
-        )
-        # Only set if not already present
-        response.headers.setdefault("Content-Security-Policy", csp)
-        return response
-
-
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app, limit: int = 60, window_seconds: int = 60):
-        super().__init__(app)
-        self.limit = limit
-        self.window = window_seconds
-        self.bucket = defaultdict(deque)  # ip -> deque of timestamps
-
-    async def dispatch(self, request, call_next):
-        ip = request.client.host if request.client else "anon"
-        now = time.time()
-        dq = self.bucket[ip]
-        # Drop old entries
-        cutoff = now - self.window
-        while dq and dq[0] < cutoff:
-            dq.popleft()
-        if len(dq) >= self.limit:
-            return PlainTextResponse("Too Many Requests", status_code=429)
-        dq.append(now)
-        response = await call_next(request)
-        # Simple rate-limit headers
-        response.headers["X-RateLimit-Limit"] = str(self.limit)
-        response.headers["X-RateLimit-Remaining"] = str(max(0, self.limit - len(dq)))
-        return response
-
-
 # Restrict Host header (configurable via ALLOWED_HOSTS env)
 _hosts = [h.strip() for h in os.getenv("ALLOWED_HOSTS", "localhost,127.0.0.1,::1").split(",") if h.strip()]
 app.add_middleware(TrustedHostMiddleware, allowed_hosts=_hosts)
@@ -99,320 +82,327 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Attach security headers and a simple in-memory rate limiter
+# Attach compression, security headers and the rate limiter (pure ASGI, see middleware.py)
+app.add_middleware(CompressionMiddleware)
 app.add_middleware(SecurityHeadersMiddleware)
-app.add_middleware(RateLimitMiddleware, limit=120, window_seconds=60)
+app.add_middleware(RateLimitMiddleware, limit=120, window_seconds=60, backend=make_backend())
+# Outermost, so rejected (429/400) requests and middleware time are counted too
+app.add_middleware(MetricsMiddleware)
+
+# Catalog pages don't depend on the logged-in user, so their HTML is cached per
+# route + normalized query + catalog version; user pages (/favorites, /login,
+# /signup) always render fresh. Cached templates show `display_image` (the photo
+# URL), never the local copy, so image downloads don't invalidate them; a page
+# that renders `local_image` must stay uncached or add image_manifest.version.
+page_cache = PageCache()
+
+
+def _cached_page(request: Request, cat, key: tuple, template_name: str, build_context):
+    key = (cat.version,) + key
+    entry = page_cache.get(key)
+    if entry is None:
+        context = build_context()
+        context["request"] = request
+        body = templates.get_template(template_name).render(context).encode("utf-8")
+        entry = page_cache.put(key, body)
+    return page_cache.respond(request, entry)
+
 
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request):
     # Render the index.html template
-    return templates.TemplateResponse("index.html", {"request": request})
+    return _cached_page(request, catalog(), ("home",), "index.html", dict)
 
 @app.get("/universities", response_class=HTMLResponse)
-async def universities(request: Request, city: str = Query(None), q: str = Query(None), program: str = Query(None), page: int = Query(1, ge=1)):
-    if not city:
+async def universities(
+    request: Request,
+    city: List[str] = Query([]),
+    q: str = Query(None),
+    program: List[str] = Query([]),
+    match: str = Query("any"),
+    page: int = Query(1, ge=1),
+):
+    q = (q or "").strip()[:100]  # basic length limit
+    # Repeated params select several cities/programs; order-insensitive for the cache key
+    cities = tuple(sorted(set(c for c in city if c)))[:10]
+    programs = tuple(sorted(set(p for p in program if p)))[:20]
+    match_all = match == "all" and len(programs) > 1
+    # A search query or program alone is enough: without a city it covers every city
+    if not cities and not q and not programs:
         return HTMLResponse("No city selected", status_code=400)
-    # Validate city against known list
-    valid_cities = set(get_cities())
-    if city not in valid_cities:
+    # One snapshot for the whole request, even if the catalog is reloaded meanwhile
+    cat = catalog()
+    # Validate cities against known list
+    if not all(cat.is_known_city(c) for c in cities):
         raise HTTPException(status_code=404, detail="City not found")
 
-    unis = get_universities_by_city(city)
+    return _cached_page(
+        request, cat, ("universities", cities, q, programs, match_all, page), "universities.html",
+        lambda: _universities_context(cat, cities, q, programs, match_all, page),
+    )
 
-    # Apply filters
-    if program:
-        unis = [u for u in unis if program in u.get("programs", [])]
-    if q:
-        q = q[:100]  # basic length limit
-        needle = q.lower()
-        unis = [
-            u for u in unis
-            if needle in u["name"].lower() or needle in u.get("description", "").lower()
-        ]
-
-    # Resolve image for each university (local cached if available, else remote)
-    unis_view_all = []
-    for u in unis:
-        u2 = dict(u)
-        # Prefer Unsplash photo for display; fallback to local-or-remote logo/default
-        disp = u.get("photo_url") or _local_or_remote(u["slug"], u.get("image", "/static/images/default.svg"))
-        u2["display_image"] = disp
-        unis_view_all.append(u2)
 
+def _universities_context(cat, cities, q, programs, match_all, page):
     # Simple server-side pagination
     page_size = 12
-    total_count = len(unis_view_all)
+    # Bitset filters over the catalog index; only the requested page is materialised
+    selection = cat.select(cities, programs, match_all, q, (page - 1) * page_size, page * page_size)
+    total_count = selection.total
     total_pages = max(1, (total_count + page_size - 1) // page_size)
-    page = min(page, total_pages)
-    start = (page - 1) * page_size
-    end = start + page_size
-    unis_view = unis_view_all[start:end]
-
-    program_options = get_programs_by_city(city)
-    return templates.TemplateResponse(
-        "universities.html",
-        {
-            "request": request,
-            "city": city,
-            "universities": unis_view,
-            "q": q or "",
-            "program": program or "",
-            "program_options": program_options,
-            "total_count": total_count,
-            "page": page,
-            "total_pages": total_pages,
-            "page_size": page_size,
-        },
-    )
+    if page > total_pages:
+        page = total_pages
+        selection = cat.select(cities, programs, match_all, q, (page - 1) * page_size, page * page_size)
+
+    query = [("city", c) for c in cities] + ([("q", q)] if q else []) + [("program", p) for p in programs]
+    if match_all:
+        query.append(("match", "all"))
+    return {
+        "city": ", ".join(cities),
+        "cities": cities,
+        # Records expose display_image/image_set themselves; no per-request copies
+        "universities": selection.records,
+        "q": q,
+        "programs": programs,
+        "match_all": match_all,
+        "program_options": selection.facets,
+        "page_query": urlencode(query),
+        "total_count": total_count,
+        "page": page,
+        "total_pages": total_pages,
+        "page_size": page_size,
+    }
+
 
 @app.get("/university/{slug}", response_class=HTMLResponse)
 async def university_detail(request: Request, slug: str):
-    uni = get_university_by_slug(slug)
+    cat = catalog()
+    uni = cat.university(slug)
     if not uni:
         raise HTTPException(status_code=404, detail="University not found")
-    uni_view = dict(uni)
-    uni_view["display_image"] = uni.get("photo_url") or _local_or_remote(uni["slug"], uni.get("image", "/static/images/default.svg"))
-    return templates.TemplateResponse(
-        "university_detail.html", {"request": request, "uni": uni_view}
+
+    return _cached_page(request, cat, ("university", slug), "university_detail.html", lambda: {"uni": uni})
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    # Prometheus scrape: every worker's counters, read from METRICS_DIR
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/api/suggest")
+async def api_suggest(prefix: str = Query("", max_length=100), city: str = Query(None), limit: int = Query(8, ge=1, le=20)):
+    # Typeahead: answered from the precomputed suggester, no template rendering
+    items = catalog().suggest(prefix, city=city, limit=limit)
+    return JSONResponse(
+        {"prefix": prefix, "suggestions": items},
+        headers={"Cache-Control": "public, max-age=300"},
     )
 
 
-def _ensure_dir(path: Path):
-    path.mkdir(parents=True, exist_ok=True)
+# --------- JSON catalog API (v1) ---------
+# Responses go through the page cache: keyed on the catalog version, stored with
+# their compressed variants, and validated by an ETag derived from that version.
 
+def _api_response(request: Request, cat, key: tuple, build_body):
+    key = (cat.version, "api/v1") + key
+    entry = page_cache.get(key)
+    if entry is None:
+        entry = page_cache.put(key, build_body(), media_type="application/json", etag=f'"v1-{cat.version}"')
+    return page_cache.respond(request, entry)
 
-ALLOWED_EXTS = ["jpg", "jpeg", "png", "webp", "svg"]
+
+def _api_fields(fields: Optional[str]):
+    try:
+        return api.parse_fields(fields)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@app.get("/api/v1/universities")
+async def api_universities(
+    request: Request,
+    city: str = Query(None, max_length=80),
+    program: str = Query(None, max_length=80),
+    q: str = Query(None, max_length=100),
+    fields: str = Query(None, max_length=200),
+    limit: int = Query(api.DEFAULT_LIMIT, ge=1, le=api.MAX_LIMIT),
+    cursor: str = Query(None, max_length=200),
+):
+    cat = catalog()
+    if city and not cat.is_known_city(city):
+        raise HTTPException(status_code=404, detail="City not found")
+    selected = _api_fields(fields)
+    query = (city or "", program or "", (q or "").strip())
+    offset = 0
+    if cursor:
+        try:
+            offset = api.decode_cursor(cursor, cat.version, query)
+        except api.CursorExpired as exc:
+            raise HTTPException(status_code=410, detail=str(exc))
+        except api.CursorError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+    return _api_response(
+        request, cat, ("universities",) + query + (selected, limit, offset),
+        lambda: _api_universities_body(cat, query, selected, limit, offset),
+    )
 
 
-def _existing_local(dest_dir: Path, slug: str):
-    for ext in ALLOWED_EXTS:
-        p = dest_dir / f"{slug}.{ext}"
-        if p.exists() and p.stat().st_size > 2048:
-            return p
-    return None
+def _api_universities_body(cat, query, fields, limit, offset):
+    city, program, q = query
+    if q:
+        # Ranks only the requested window instead of every hit
+        sel = cat.select((city,) if city else (), (program,) if program else (), query=q,
+                         start=offset, stop=offset + limit)
+        return _api_page(cat, query, fields, offset, sel.records, sel.total)
+    if program:
+        unis = cat.universities_by_program(city, program)
+    elif city:
+        unis = cat.universities_by_city(city)
+    else:
+        unis = cat.records
+    return _api_page(cat, query, fields, offset, unis[offset:offset + limit], len(unis))
+
+
+def _api_page(cat, query, fields, offset, page, total):
+    end = offset + len(page)
+    return api.dumps({
+        "data": [api.project(u, fields) for u in page],
+        "total": total,
+        "next_cursor": api.encode_cursor(cat.version, query, end) if end < total else None,
+        "catalog_version": cat.version,
+    })
+
+
+@app.get("/api/v1/universities/{slug}")
+async def api_university(request: Request, slug: str, fields: str = Query(None, max_length=200)):
+    cat = catalog()
+    uni = cat.university(slug)
+    if not uni:
+        raise HTTPException(status_code=404, detail="University not found")
+    selected = _api_fields(fields)
+    return _api_response(request, cat, ("university", slug, selected),
+                         lambda: api.dumps({"data": api.project(uni, selected), "catalog_version": cat.version}))
 
 
-def _download_one(headers, dest_dir: Path, slug: str, url: str) -> bool:
-    if requests is None:
-        return False
-    if not slug or not url:
-        return False
-    if _existing_local(dest_dir, slug):
-        return True
+@app.get("/api/universities/batch")
+async def api_universities_batch(slugs: str = Query("", max_length=20000)):
+    # Favorites cards: one slug-index lookup per requested slug, never a catalog scan
     try:
-        r = requests.get(url, headers=headers, timeout=5, allow_redirects=True)
-        if r.status_code != 200 or not r.content:
-            return False
-        ctype = r.headers.get("content-type", "").lower()
-        ext = "jpg"
-        if "svg" in ctype:
-            ext = "svg"
-        elif "png" in ctype:
-            ext = "png"
-        elif "webp" in ctype:
-            ext = "webp"
-        elif "jpeg" in ctype:
-            ext = "jpg"
-        dest_file = dest_dir / f"{slug}.{ext}"
-        with open(dest_file, "wb") as f:
-            f.write(r.content)
-        return True
-    except RequestException:
-        return False
-
-
-def _download_first_available(headers, dest_dir: Path, slug: str, urls):
-    for url in urls:
-        if _download_one(headers, dest_dir, slug, url):
-            return True
-    return False
-
-
-def _cache_images():
-    if requests is None:
-        return  # Skip caching if requests is unavailable
-    dest_dir = Path("static/images")
-    _ensure_dir(dest_dir)
-    headers = {"User-Agent": "MyUni/1.0 (+cache)"}
-    with ThreadPoolExecutor(max_workers=6) as ex:
-        futures = []
-        for u in ALL_UNIS:
-            slug = u.get("slug")
-            if not slug:
-                continue
-            sources = []
-            img = u.get("image")
-            if img:
-                sources.append(img)
-            # Last-resort fast placeholder to ensure something shows if remotes fail
-            sources.append(f"https://picsum.photos/seed/{slug}/1200/800")
-            futures.append(ex.submit(_download_first_available, headers, dest_dir, slug, sources))
-        for _ in as_completed(futures):
-            pass
-
-
-@app.on_event("startup")
-async def prefetch_images_on_startup():
-    # Run in background thread to avoid blocking startup
-    threading.Thread(target=_cache_images, daemon=True).start()
-
-
-def _local_or_remote(slug: str, remote_url: str) -> str:
-    dest_dir = Path("static/images")
-    p = _existing_local(dest_dir, slug)
-    if p:
-        return f"/static/images/{p.name}"
-    # Use configured remote URL if provided, else neutral default
-    return remote_url or "/static/images/default.svg"
+        wanted = api.parse_slugs(slugs)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    cat = catalog()
+    found = cat.universities(wanted)
+    known = {u.slug for u in found}
+    body = {
+        "data": [api.card(u) for u in found],
+        "missing": [s for s in wanted if s not in known],
+        "catalog_version": cat.version,
+    }
+    return Response(api.dumps(body), media_type="application/json")
 
 
 # --------- Basic data submission API (favorites list) ---------
 
 class SavePayload(BaseModel):
     name: str = Field(min_length=1, max_length=80)
-    email: EmailStr
+    email: str = Field(min_length=3, max_length=254)
     city: Optional[str] = Field(default=None, max_length=80)
     favorites: List[str] = Field(default_factory=list)
     note: Optional[str] = Field(default=None, max_length=500)
 
 
-def _safe_write_jsonl(path: Path, obj: dict):
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with open(path, "a", encoding="utf-8") as f:
-        import json, time
-        obj = dict(obj)
-        obj["ts"] = int(time.time())
-        f.write(json.dumps(obj, ensure_ascii=False) + "\n")
+def _validate_email(value: str) -> str:
+    # email-validator (and its DNS stack) is imported on first use instead of at boot;
+    # without it the address is accepted as given
+    try:
+        from email_validator import EmailNotValidError, validate_email
+    except ImportError:
+        return value
+    try:
+        result = validate_email(value, check_deliverability=False)
+    except EmailNotValidError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    return getattr(result, "normalized", None) or result.email
+
+
+# Submissions are queued and group-committed by a background flusher (drained in lifespan)
+submission_sink = SubmissionSink()
 
 
 @app.post("/api/save")
 async def save_favorites(payload: SavePayload, request: Request):
     # Basic validation for city in known list, silently drop unknowns
-    cities = set(get_cities())
-    city = payload.city if payload.city in cities else None
+    cat = catalog()
+    city = payload.city if cat.is_known_city(payload.city) else None
 
     # Only accept known slugs
-    known_slugs = {u.get("slug") for u in ALL_UNIS}
-    favorites = [s for s in payload.favorites if s in known_slugs][:100]
+    favorites = [s for s in payload.favorites if cat.university(s)][:100]
 
-    # Persist to a JSONL file
+    # Persist to a JSONL file (batched, see submissions.py)
     record = {
         "name": payload.name.strip(),
-        "email": str(payload.email),
+        "email": _validate_email(payload.email.strip()),
         "city": city,
         "favorites": favorites,
         "note": (payload.note or "").strip(),
         "ip": request.client.host if request.client else None,
     }
-    _safe_write_jsonl(Path("data/submissions.jsonl"), record)
+    if not submission_sink.submit(record):
+        raise HTTPException(status_code=503, detail="Busy, please retry")
     return {"ok": True, "saved": len(favorites)}
 
 
 # ---------------- Accounts and sessions ----------------
 
-USERS_PATH = Path("data/users.json")
-SESSIONS_PATH = Path("data/sessions.json")
-
-def _load_json(path: Path, default):
-    try:
-        if path.exists():
-            with open(path, "r", encoding="utf-8") as f:
-                return json.load(f)
-    except Exception:
-        pass
-    return default
-
-def _save_json(path: Path, data):
-    path.parent.mkdir(parents=True, exist_ok=True)
-    tmp = path.with_suffix(path.suffix + ".tmp")
-    with open(tmp, "w", encoding="utf-8") as f:
-        json.dump(data, f)
-    tmp.replace(path)
-
-try:
-    import bcrypt
-    def _hash_pw(pw: str) -> str:
-        return bcrypt.hashpw(pw.encode(), bcrypt.gensalt()).decode()
-    def _check_pw(pw: str, hashed: str) -> bool:
-        try:
-            return bcrypt.checkpw(pw.encode(), hashed.encode())
-        except Exception:
-            return False
-except Exception:
-    import hashlib
-    def _hash_pw(pw: str) -> str:
-        salt = secrets.token_hex(8)
-        h = hashlib.sha256((salt+pw).encode()).hexdigest()
-        return f"sha256${salt}${h}"
-    def _check_pw(pw: str, hashed: str) -> bool:
-        try:
-            algo, salt, h = hashed.split("$")
-            return hashlib.sha256((salt+pw).encode()).hexdigest() == h
-        except Exception:
-            return False
-
-def _get_users():
-    return _load_json(USERS_PATH, [])
-
-def _save_users(users):
-    _save_json(USERS_PATH, users)
-
-def _get_sessions():
-    return _load_json(SESSIONS_PATH, {})
+session_store = make_session_store()
+user_repo = make_user_repository()
+boot.mark("stores")
 
-def _save_sessions(s):
-    _save_json(SESSIONS_PATH, s)
+@app.exception_handler(PasswordPoolBusy)
+async def password_pool_busy(request: Request, exc: PasswordPoolBusy):
+    # Shed login/signup load instead of queueing unbounded bcrypt work
+    return PlainTextResponse("Server busy, please retry", status_code=503, headers={"Retry-After": "2"})
 
 def _find_user_by_email(email: str):
-    email = (email or "").strip().lower()
-    for u in _get_users():
-        if u.get("email") == email:
-            return u
-    return None
-
-def _create_user(name: str, email: str, password: str):
-    email = (email or "").strip().lower()
-    users = _get_users()
-    if any(u.get("email") == email for u in users):
-        return None
-    uid = secrets.token_hex(8)
-    user = {"id": uid, "name": name.strip(), "email": email, "password": _hash_pw(password), "favorites": []}
-    users.append(user)
-    _save_users(users)
-    return user
+    return user_repo.get_by_email(email)
+
+async def _create_user(name: str, email: str, password: str):
+    return user_repo.create(name, email, await hasher.hash(password))
 
-def _auth_user(email: str, password: str):
+async def _auth_user(email: str, password: str):
     u = _find_user_by_email(email)
     if not u:
         return None
-    return u if _check_pw(password, u.get("password")) else None
+    return u if await hasher.verify(password, u.get("password")) else None
 
 def _create_session(user_id: str):
-    sessions = _get_sessions()
-    sid = secrets.token_urlsafe(24)
-    sessions[sid] = {"user_id": user_id, "ts": int(time.time())}
-    _save_sessions(sessions)
-    return sid
+    return session_store.create(user_id)
 
 def _delete_session(sid: str):
-    sessions = _get_sessions()
-    if sid in sessions:
-        sessions.pop(sid)
-        _save_sessions(sessions)
+    session_store.delete(sid)
+
+def _set_account_cookie(resp, user: dict):
+    # Readable by app.js, which keeps favorites sync state per account (not a credential)
+    account = hashlib.sha256(user["id"].encode()).hexdigest()[:16]
+    resp.set_cookie("myuni_account", account, max_age=SESSION_TTL, samesite="lax")
+
+def _login_redirect(user: dict):
+    resp = RedirectResponse(url="/favorites", status_code=303)
+    resp.set_cookie("myuni_session", _create_session(user["id"]), max_age=SESSION_TTL, httponly=True, samesite="lax")
+    _set_account_cookie(resp, user)
+    return resp
 
 def _current_user(request: Request):
     sid = request.cookies.get("myuni_session")
     if not sid:
         return None
-    sessions = _get_sessions()
-    sess = sessions.get(sid)
-    if not sess:
+    # Writes check the shared store directly, so a sid logged out on another worker
+    # can't change anything during the session cache window
+    uid = session_store.get(sid, fresh=request.method not in ("GET", "HEAD"))
+    if not uid:
         return None
-    uid = sess.get("user_id")
-    for u in _get_users():
-        if u.get("id") == uid:
-            return u
-    return None
+    return user_repo.get_by_id(uid)
 
 @app.get("/signup", response_class=HTMLResponse)
 async def signup_page(request: Request):
@@ -428,13 +418,10 @@ async def signup(request: Request):
         return PlainTextResponse("Missing fields", status_code=400)
     if _find_user_by_email(email):
         return PlainTextResponse("Email already registered", status_code=400)
-    user = _create_user(name, email, password)
+    user = await _create_user(name, email, password)
     if not user:
         return PlainTextResponse("Could not create user", status_code=400)
-    sid = _create_session(user["id"])
-    resp = RedirectResponse(url="/favorites", status_code=303)
-    resp.set_cookie("myuni_session", sid, httponly=True, samesite="lax")
-    return resp
+    return _login_redirect(user)
 
 @app.get("/login", response_class=HTMLResponse)
 async def login_page(request: Request):
@@ -445,13 +432,10 @@ async def login(request: Request):
     form = await request.form()
     email = (form.get("email") or "").strip()
     password = form.get("password") or ""
-    user = _auth_user(email, password)
+    user = await _auth_user(email, password)
     if not user:
         return PlainTextResponse("Invalid credentials", status_code=401)
-    sid = _create_session(user["id"])
-    resp = RedirectResponse(url="/favorites", status_code=303)
-    resp.set_cookie("myuni_session", sid, httponly=True, samesite="lax")
-    return resp
+    return _login_redirect(user)
 
 @app.post("/logout")
 async def logout(request: Request):
@@ -460,6 +444,7 @@ async def logout(request: Request):
         _delete_session(sid)
     resp = RedirectResponse(url="/", status_code=303)
     resp.delete_cookie("myuni_session")
+    resp.delete_cookie("myuni_account")
     return resp
 
 @app.get("/favorites", response_class=HTMLResponse)
@@ -467,37 +452,71 @@ async def favorites_page(request: Request):
     user = _current_user(request)
     context = {"request": request, "user": user}
     if user:
-        slugs = set(user.get("favorites") or [])
-        items = []
-        for u in ALL_UNIS:
-            if u.get("slug") in slugs:
-                u2 = dict(u)
-                u2["local_image"] = _local_or_remote(u["slug"], u.get("image", "/static/images/default.svg"))
-                items.append(u2)
-        context["items"] = items
-    return templates.TemplateResponse("favorites.html", context)
+        context["items"] = catalog().universities(user.get("favorites") or [])
+    resp = templates.TemplateResponse("favorites.html", context)
+    if user and "myuni_account" not in request.cookies:
+        _set_account_cookie(resp, user)  # sessions from before the account cookie existed
+    return resp
 
 class FavoritePayload(BaseModel):
     favorites: List[str] = Field(default_factory=list)
 
+class FavoritesPatch(BaseModel):
+    # `version` is the last version this client saw (omit on a device's first sync)
+    version: Optional[int] = Field(default=None, ge=0)
+    add: List[str] = Field(default_factory=list, max_length=200)
+    remove: List[str] = Field(default_factory=list, max_length=200)
+
+def _favorites_delta(update):
+    body = {"version": update.version}
+    if update.favorites is not None:
+        body["favorites"] = update.favorites
+    else:
+        body["added"], body["removed"] = update.added, update.removed
+    if update.conflicts:
+        body["conflicts"] = update.conflicts
+    if update.rejected:
+        # Not saved: the list is full (users.MAX_FAVORITES); the client drops them
+        body["rejected"] = update.rejected
+    return body
+
 @app.get("/api/favorites")
-async def api_get_favorites(request: Request):
+async def api_get_favorites(request: Request, since: int = Query(None, ge=0)):
+    user = _current_user(request)
+    if not user:
+        raise HTTPException(status_code=401, detail="Login required")
+    version = user.get("favorites_version", 0)
+    if since is None:
+        return {"favorites": user.get("favorites", []), "version": version}
+    if since == version:
+        return {"version": version, "added": [], "removed": []}
+    # Delta since the client's version (or the full list if the change log no longer reaches it)
+    return _favorites_delta(user_repo.favorites_since(user["id"], since))
+
+@app.patch("/api/favorites")
+async def api_patch_favorites(payload: FavoritesPatch, request: Request):
+    """Apply add/remove deltas; the response carries only what changed since `version`."""
     user = _current_user(request)
     if not user:
         raise HTTPException(status_code=401, detail="Login required")
-    return {"favorites": user.get("favorites", [])}
+    if set(payload.add) & set(payload.remove):
+        raise HTTPException(status_code=422, detail="A slug cannot be both added and removed")
+    cat = catalog()
+    add = [s for s in dict.fromkeys(payload.add) if cat.university(s)]
+    update = user_repo.update_favorites(user["id"], add, list(dict.fromkeys(payload.remove)), payload.version)
+    if update is None:
+        raise HTTPException(status_code=401, detail="Login required")
+    if update.conflicts:
+        # Another device changed these slugs the other way: nothing applied, client rebases
+        return JSONResponse(_favorites_delta(update), status_code=409)
+    return _favorites_delta(update)
 
 @app.post("/api/favorites")
 async def api_set_favorites(payload: FavoritePayload, request: Request):
     user = _current_user(request)
     if not user:
         raise HTTPException(status_code=401, detail="Login required")
-    known = {u.get("slug") for u in ALL_UNIS}
-    favs = [s for s in payload.favorites if s in known][:200]
-    users = _get_users()
-    for u in users:
-        if u.get("id") == user.get("id"):
-            u["favorites"] = favs
-            break
-    _save_users(users)
+    cat = catalog()
+    favs = [s for s in payload.favorites if cat.university(s)][:200]
+    user_repo.set_favorites(user["id"], favs)
     return {"ok": True, "saved": len(favs)}
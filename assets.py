@@ -0,0 +1,164 @@
+# Fingerprinted static assets: hashed URLs, immutable caching, precompressed .br/.gz siblings
+#
+#   python assets.py                 # write .gz (and .br if `brotli` is installed) next to text assets
+#
+# At startup `AssetManifest.scan()` hashes the CSS/JS/SVG files under static/ so
+# templates can link `asset_url("app.js")` -> /static/app.<hash>.js. Hashed URLs
+# never change content, so they are served with a one-year immutable Cache-Control.
+import gzip
+import hashlib
+import mimetypes
+import os
+import stat
+import sys
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:  # optional: precompress() then writes .gz siblings only
+    brotli = None
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+from compression import negotiate
+
+STATIC_DIR = Path("static")
+STATIC_URL = "/static"
+FINGERPRINT_EXTS = ("css", "js", "svg", "ico", "woff2", "webmanifest")
+# Text types worth precompressing; images are already compressed
+COMPRESS_EXTS = ("css", "js", "svg", "json", "webmanifest", "map")
+MIN_COMPRESS_BYTES = 512
+IMMUTABLE = "public, max-age=31536000, immutable"
+# Files under these prefixes already carry a content hash in their name
+HASHED_PREFIXES = ("images/derived/",)
+# Preferred first; (content-coding, sibling suffix)
+SIBLINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+class AssetManifest:
+    """Maps logical static paths to content-hashed names and back."""
+
+    def __init__(self, directory: Path = STATIC_DIR, url_prefix: str = STATIC_URL):
+        self.directory = Path(directory)
+        self.url_prefix = url_prefix
+        self.hashed = {}    # "app.js" -> "app.3f9c2a1b7d.js"
+        self.original = {}  # "app.3f9c2a1b7d.js" -> "app.js"
+
+    def scan(self):
+        hashed, original = {}, {}
+        for root, dirs, files in os.walk(self.directory):
+            rel_root = Path(root).relative_to(self.directory).as_posix()
+            rel_root = "" if rel_root == "." else rel_root + "/"
+            dirs[:] = [d for d in dirs if not (rel_root + d + "/").startswith(HASHED_PREFIXES)]
+            for name in files:
+                stem, _, ext = name.rpartition(".")
+                if not stem or ext not in FINGERPRINT_EXTS:
+                    continue
+                with open(os.path.join(root, name), "rb") as f:
+                    digest = hashlib.sha256(f.read()).hexdigest()[:10]
+                rel = rel_root + name
+                fingerprinted = f"{rel_root}{stem}.{digest}.{ext}"
+                hashed[rel] = fingerprinted
+                original[fingerprinted] = rel
+        self.hashed, self.original = hashed, original
+
+    def url(self, path: str) -> str:
+        """Jinja `asset_url()`: the fingerprinted URL, or the plain one for unknown files."""
+        path = path.lstrip("/")
+        return f"{self.url_prefix}/{self.hashed.get(path, path)}"
+
+
+class AssetFiles(StaticFiles):
+    """StaticFiles that understands fingerprinted names and precompressed siblings.
+
+    `/static/app.<hash>.js` serves `app.js` with immutable caching; plain URLs keep
+    the default ETag/Last-Modified revalidation. When the client accepts br or gzip
+    and an up-to-date `.br`/`.gz` sibling exists, that file is sent instead.
+    """
+
+    def __init__(self, *, manifest: AssetManifest, **kwargs):
+        super().__init__(**kwargs)
+        self.manifest = manifest
+
+    async def get_response(self, path: str, scope):
+        if scope["method"] not in ("GET", "HEAD"):
+            raise HTTPException(status_code=405)
+        rel = path.replace(os.sep, "/")
+        logical = self.manifest.original.get(rel)
+        immutable = logical is not None or rel.startswith(HASHED_PREFIXES)
+        if logical is None and rel.rpartition(".")[2] not in COMPRESS_EXTS:
+            response = await super().get_response(path, scope)
+        else:
+            response = await anyio.to_thread.run_sync(self._lookup, logical or rel, scope)
+        if immutable and response.status_code in (200, 304):
+            response.headers["Cache-Control"] = IMMUTABLE
+        return response
+
+    def _lookup(self, rel: str, scope):
+        full_path, st = self.lookup_path(rel)
+        if st is None or not stat.S_ISREG(st.st_mode):
+            raise HTTPException(status_code=404)
+        headers = Headers(scope=scope)
+        encoding = None
+        if rel.rpartition(".")[2] in COMPRESS_EXTS:
+            accept = headers.get("accept-encoding", "")
+            for token, suffix in SIBLINGS:
+                if negotiate(accept, (token,)) is None:
+                    continue
+                sib_path, sib = self.lookup_path(rel + suffix)
+                # A sibling older than its source is stale; fall back to the original
+                if sib is not None and stat.S_ISREG(sib.st_mode) and sib.st_mtime >= st.st_mtime:
+                    full_path, st, encoding = sib_path, sib, token
+                    break
+        # media_type comes from the original name, not the .br/.gz suffix
+        response = FileResponse(full_path, stat_result=st,
+                                media_type=mimetypes.guess_type(rel)[0] or "text/plain")
+        response.headers["Vary"] = "Accept-Encoding"
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+        if self.is_not_modified(response.headers, headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+assets = AssetManifest()
+assets.scan()
+
+
+def precompress(directory: Path = STATIC_DIR) -> int:
+    """Write .gz (and .br when available) siblings for text assets; returns files written."""
+    written = 0
+    for path in Path(directory).rglob("*"):
+        if not path.is_file() or path.suffix[1:] not in COMPRESS_EXTS:
+            continue
+        st = path.stat()
+        if st.st_size < MIN_COMPRESS_BYTES:
+            continue
+        data = None
+        for suffix, compress in ((".gz", lambda d: gzip.compress(d, 9, mtime=0)),
+                                 (".br", brotli and (lambda d: brotli.compress(d, quality=11)))):
+            if compress is None:
+                continue
+            target = path.with_name(path.name + suffix)
+            if target.exists() and target.stat().st_mtime >= st.st_mtime:
+                continue
+            data = path.read_bytes() if data is None else data
+            packed = compress(data)
+            if len(packed) >= len(data):
+                continue  # not worth it; the server falls back to the original
+            tmp = target.with_name(target.name + ".tmp")
+            tmp.write_bytes(packed)
+            tmp.replace(target)
+            written += 1
+    return written
+
+
+if __name__ == "__main__":
+    n = precompress()
+    print(f"wrote {n} precompressed file(s)")
+    if brotli is None:
+        print("brotli not installed; only .gz siblings were written", file=sys.stderr)
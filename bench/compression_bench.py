@@ -0,0 +1,128 @@
+# Compression cost vs bytes saved on the /universities page.
+#
+#   python bench/compression_bench.py [--requests 1000] [--path "/universities?city=Dubai"]
+#
+# Part 1 times each codec/level on the rendered page body. Part 2 drives requests
+# in-process: uncompressed, compressed per request by CompressionMiddleware, and
+# served from the page cache's precompressed variants.
+import argparse
+import asyncio
+import atexit
+import gzip
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.chdir(ROOT)
+_tmp = tempfile.mkdtemp(prefix="myuni-bench-")
+atexit.register(shutil.rmtree, _tmp, ignore_errors=True)
+# Must be set before the app modules read them: keep the bench off the real data files
+os.environ.setdefault("MYUNI_DB", os.path.join(_tmp, "myuni.db"))
+os.environ.setdefault("SUBMISSIONS_PATH", os.path.join(_tmp, "submissions.jsonl"))
+os.environ.setdefault("IMAGE_SYNC_STATE", os.path.join(_tmp, "image-sync.json"))
+# Not the server's shared directory: /metrics on a live server would sum the bench's counters
+os.environ.setdefault("METRICS_DIR", os.path.join(_tmp, "metrics"))
+
+from starlette.applications import Starlette  # noqa: E402
+from starlette.middleware import Middleware  # noqa: E402
+from starlette.responses import HTMLResponse  # noqa: E402
+from starlette.routing import Route  # noqa: E402
+
+import app as myuni  # noqa: E402
+import compression  # noqa: E402
+from middleware import CompressionMiddleware  # noqa: E402
+
+
+async def call(app, path: str, accept_encoding: str):
+    raw_path, _, query = path.partition("?")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": raw_path, "raw_path": raw_path.encode(), "query_string": query.encode(),
+        "root_path": "", "client": ("127.0.0.1", 50000), "server": ("localhost", 80),
+        "headers": [(b"host", b"localhost"), (b"accept-encoding", accept_encoding.encode())],
+    }
+    status, size = 0, 0
+    sent_body = False
+
+    async def receive():
+        nonlocal sent_body
+        if not sent_body:
+            sent_body = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal status, size
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            size += len(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return status, size
+
+
+async def measure(app, path: str, accept_encoding: str, n: int):
+    for _ in range(min(50, n)):
+        await call(app, path, accept_encoding)
+    start = time.perf_counter()
+    for _ in range(n):
+        status, size = await call(app, path, accept_encoding)
+        assert status == 200
+    return n / (time.perf_counter() - start), size
+
+
+def codec_table(body: bytes, rounds: int):
+    codecs = [("gzip", level, lambda b, level=level: gzip.compress(b, level, mtime=0)) for level in (1, 6, 9)]
+    if compression.brotli is not None:
+        codecs += [("br", q, lambda b, q=q: compression.brotli.compress(b, quality=q)) for q in (1, 4, 5, 7, 9, 11)]
+    print(f"page body: {len(body)} bytes\n")
+    print(f"{'codec':<8}{'level':>6}{'bytes':>9}{'saved':>8}{'us/op':>10}{'MB/s':>9}")
+    for name, level, fn in codecs:
+        n = max(3, rounds // 10) if name == "br" and level >= 9 else rounds
+        start = time.perf_counter()
+        for _ in range(n):
+            out = fn(body)
+        per_op = (time.perf_counter() - start) / n
+        saved = 1 - len(out) / len(body)
+        print(f"{name:<8}{level:>6}{len(out):>9}{saved:>7.0%}{per_op * 1e6:>10.0f}{len(body) / per_op / 1e6:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--path", default="/universities?city=Dubai")
+    args = parser.parse_args()
+
+    from fastapi.testclient import TestClient
+    body = TestClient(myuni.app, base_url="http://localhost").get(
+        args.path, headers={"accept-encoding": "identity"}).content
+    codec_table(body, args.rounds)
+
+    # Same bytes from a handler that renders nothing, so only encoding cost differs
+    async def page(request):
+        return HTMLResponse(body)
+    plain = Starlette(routes=[Route(args.path.partition("?")[0], page)])
+    per_request = Starlette(routes=plain.routes, middleware=[Middleware(CompressionMiddleware)])
+    # The real routes (page cache) behind the same middleware; no rate limiter
+    cached = Starlette(routes=myuni.app.routes, middleware=[Middleware(CompressionMiddleware)])
+
+    print(f"\n{'mode':<34}{'encoding':>10}{'req/s':>10}{'bytes':>9}")
+    rows = [("no compression", plain, "identity"),
+            ("per request (middleware)", per_request, "gzip")]
+    if compression.brotli is not None:
+        rows.append(("per request (middleware)", per_request, "br"))
+    rows += [("page cache, precompressed", cached, enc) for enc in ("identity",) + compression.ENCODINGS]
+    for label, app, enc in rows:
+        rate, size = asyncio.run(measure(app, args.path, enc, args.requests))
+        print(f"{label:<34}{enc:>10}{rate:>10.0f}{size:>9}")
+
+
+if __name__ == "__main__":
+    main()
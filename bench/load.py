@@ -0,0 +1,196 @@
+# In-process ASGI load driver for the main routes: latency percentiles and req/s.
+#
+#   python bench/load.py [--requests 2000] [--concurrency 16] [--records N] [--json out.json]
+#
+# Requests go straight into the ASGI app (no sockets), through the same middleware
+# as app.app minus the rate limiter. Databases and submission files live in a
+# temporary directory (as are metrics files); --records swaps in a synthetic catalog of that size.
+# BCRYPT_ROUNDS defaults to 10 here so the POST /login run stays short.
+import argparse
+import asyncio
+import atexit
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from urllib.parse import urlencode
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "bench"))
+os.chdir(ROOT)
+
+_tmp = tempfile.mkdtemp(prefix="myuni-bench-")
+atexit.register(shutil.rmtree, _tmp, ignore_errors=True)
+# Must be set before the app modules read them
+os.environ.setdefault("MYUNI_DB", os.path.join(_tmp, "myuni.db"))
+os.environ.setdefault("SUBMISSIONS_PATH", os.path.join(_tmp, "submissions.jsonl"))
+os.environ.setdefault("IMAGE_SYNC_STATE", os.path.join(_tmp, "image-sync.json"))
+os.environ.setdefault("BCRYPT_ROUNDS", "10")
+# Not the server's shared directory: /metrics on a live server would sum the bench's counters
+os.environ.setdefault("METRICS_DIR", os.path.join(_tmp, "metrics"))
+
+from starlette.applications import Starlette  # noqa: E402
+
+import app as myuni  # noqa: E402
+import database  # noqa: E402
+from middleware import RateLimitMiddleware  # noqa: E402
+from synthetic import make_catalog  # noqa: E402
+
+
+class Response:
+    __slots__ = ("status", "headers", "body")
+
+    def __init__(self):
+        self.status = 0
+        self.headers = []
+        self.body = b""
+
+
+async def call(app, method: str, path: str, body: bytes = b"", headers=()) -> Response:
+    raw_path, _, query = path.partition("?")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+        "scheme": "http", "path": raw_path, "raw_path": raw_path.encode(), "query_string": query.encode(),
+        "root_path": "", "client": ("127.0.0.1", 50000), "server": ("localhost", 80),
+        "headers": [(b"host", b"localhost"), (b"content-length", str(len(body)).encode()), *headers],
+    }
+    resp = Response()
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            resp.status = message["status"]
+            resp.headers = message.get("headers", [])
+        elif message["type"] == "http.response.body":
+            resp.body += message.get("body", b"")
+
+    await app(scope, receive, send)
+    return resp
+
+
+def build_app():
+    middleware = [m for m in myuni.app.user_middleware if m.cls is not RateLimitMiddleware]
+    return Starlette(routes=myuni.app.routes, middleware=middleware,
+                     exception_handlers=myuni.app.exception_handlers)
+
+
+def percentile(sorted_values, p: float) -> float:
+    # Nearest-rank
+    k = max(0, min(len(sorted_values) - 1, round(p / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[k]
+
+
+async def session_cookie(app) -> bytes:
+    form = urlencode({"name": "Bench", "email": f"bench-{time.time_ns()}@example.com", "password": "bench-pass"}).encode()
+    resp = await call(app, "POST", "/signup", form, [(b"content-type", b"application/x-www-form-urlencoded")])
+    for k, v in resp.headers:
+        if k.lower() == b"set-cookie" and v.startswith(b"myuni_session="):
+            return v.split(b";", 1)[0]
+    raise RuntimeError(f"signup failed: {resp.status}")
+
+
+def scenarios(cat, cookie: bytes, email: str):
+    slugs = [u.slug for u in cat.records]
+    city = cat.index.cities[0]
+    json_hdr = (b"content-type", b"application/json")
+    save_body = json.dumps({"name": "Bench", "email": "bench@example.com", "city": city, "favorites": slugs[:3]}).encode()
+    login_body = urlencode({"email": email, "password": "bench-pass"}).encode()
+    form_hdr = (b"content-type", b"application/x-www-form-urlencoded")
+    return {
+        "GET /universities": lambda i: ("GET", f"/universities?{urlencode({'city': city, 'page': i % 3 + 1})}", b"", (), 200),
+        "GET /universities?q=": lambda i: ("GET", f"/universities?q=uni&page={i % 2 + 1}", b"", (), 200),
+        "GET /university/{slug}": lambda i: ("GET", f"/university/{slugs[i % len(slugs)]}", b"", (), 200),
+        "GET /api/v1/universities": lambda i: ("GET", f"/api/v1/universities?{urlencode({'city': city, 'fields': 'slug,name,city', 'limit': 10 + i % 3})}", b"", (), 200),
+        "GET /api/universities/batch": lambda i: ("GET", f"/api/universities/batch?slugs={','.join(slugs[i % 7:i % 7 + 12])}", b"", (), 200),
+        "GET /login": lambda i: ("GET", "/login", b"", (), 200),
+        "POST /login": lambda i: ("POST", "/login", login_body, (form_hdr,), 303),
+        "POST /api/save": lambda i: ("POST", "/api/save", save_body, (json_hdr,), 200),
+        "GET /api/favorites": lambda i: ("GET", "/api/favorites", b"", ((b"cookie", cookie),), 200),
+    }
+
+
+async def drive(app, make_request, n: int, concurrency: int) -> dict:
+    latencies = []
+    errors = 0
+    counter = iter(range(n))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            method, path, body, headers, expected = make_request(i)
+            start = time.perf_counter_ns()
+            resp = await call(app, method, path, body, headers)
+            latencies.append(time.perf_counter_ns() - start)
+            if resp.status != expected:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    ms = lambda ns: round(ns / 1e6, 3)  # noqa: E731
+    return {
+        "requests": n, "errors": errors, "rps": round(n / elapsed, 1),
+        "p50_ms": ms(percentile(latencies, 50)), "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)), "max_ms": ms(latencies[-1]),
+    }
+
+
+async def run_async(n: int, concurrency: int, only=None) -> dict:
+    app = build_app()
+    cookie = await session_cookie(app)
+    uid = myuni.session_store.get(cookie.split(b"=", 1)[1].decode())
+    email = myuni.user_repo.get_by_id(uid)["email"]
+    results = {}
+    for name, make_request in scenarios(database.catalog(), cookie, email).items():
+        if only and not any(o in name for o in only):
+            continue
+        # bcrypt is ~100x slower than everything else; keep its run short
+        count = max(20, n // 50) if name == "POST /login" else n
+        await drive(app, make_request, min(50, count), concurrency)  # warm-up (page cache, pools)
+        results[name] = await drive(app, make_request, count, concurrency)
+    return results
+
+
+def run(n: int = 2000, concurrency: int = 16, records: int = None, only=None) -> dict:
+    if records:
+        database.catalog_manager.current = database.Catalog(make_catalog(records))
+    try:
+        return asyncio.run(run_async(n, concurrency, only))
+    finally:
+        myuni.submission_sink.close()
+
+
+def print_table(results: dict):
+    print(f"{'scenario':<26}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}")
+    for name, r in results.items():
+        print(f"{name:<26}{r['rps']:>9.0f}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}{r['errors']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--records", type=int, help="use a synthetic catalog of this size")
+    parser.add_argument("--only", help="comma-separated substrings of scenario names")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+    results = run(args.requests, args.concurrency, args.records, args.only and args.only.split(","))
+    print_table(results)
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
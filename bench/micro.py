@@ -0,0 +1,101 @@
+# Micro-benchmarks of the catalog lookups at synthetic catalog sizes.
+#
+#   python bench/micro.py [--sizes 50,5000,50000] [--json out.json]
+#
+# Each size gets its own Catalog snapshot, swapped into database.catalog_manager
+# so the public database.* functions are what is measured.
+import argparse
+import atexit
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import timeit
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "bench"))
+os.chdir(ROOT)
+_tmp = tempfile.mkdtemp(prefix="myuni-bench-")
+atexit.register(shutil.rmtree, _tmp, ignore_errors=True)
+# Must be set before the app modules read them: keep the bench off the real data files
+os.environ.setdefault("MYUNI_DB", os.path.join(_tmp, "myuni.db"))
+os.environ.setdefault("SUBMISSIONS_PATH", os.path.join(_tmp, "submissions.jsonl"))
+os.environ.setdefault("IMAGE_SYNC_STATE", os.path.join(_tmp, "image-sync.json"))
+# Not the server's shared directory: /metrics on a live server would sum the bench's counters
+os.environ.setdefault("METRICS_DIR", os.path.join(_tmp, "metrics"))
+
+import database  # noqa: E402
+from synthetic import make_catalog  # noqa: E402
+
+SIZES = (50, 5000, 50000)
+
+
+def ns_per_op(fn, repeat: int = 5, min_time: float = 0.05) -> float:
+    """Median over `repeat` runs, each long enough (>= min_time) to swamp timer noise."""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    number = max(number, int(number * min_time / 0.2) or 1)
+    runs = timer.repeat(repeat=repeat, number=number)
+    return statistics.median(runs) / number * 1e9
+
+
+def bench_size(n: int) -> dict:
+    records = make_catalog(n)
+    start = time.perf_counter()
+    cat = database.Catalog(records)
+    build_ms = (time.perf_counter() - start) * 1000
+    previous = database.catalog_manager.current
+    database.catalog_manager.current = cat
+    try:
+        slug = cat.records[n // 2].slug
+        uni = cat.records[n // 2]
+        cases = {
+            "get_universities_by_city": lambda: database.get_universities_by_city("Dubai"),
+            "get_programs_by_city": lambda: database.get_programs_by_city("Dubai"),
+            "get_university_by_slug": lambda: database.get_university_by_slug(slug),
+            "search (q)": lambda: database.search_universities("global college"),
+            "search (q + city)": lambda: database.search_universities("glob", city="Dubai"),
+            "local image (_local_or_remote)": lambda: uni.local_image,
+            "select 2 cities, 2 programs (any)": lambda: cat.select(("Dubai", "Sharjah"), ("Engineering", "Law"), stop=12),
+            "select 2 cities, 2 programs (all)": lambda: cat.select(("Dubai", "Sharjah"), ("Engineering", "Law"), True, stop=12),
+            "get_program_counts": lambda: database.get_program_counts("Dubai"),
+        }
+        out = {"catalog_build_ms": round(build_ms, 1)}
+        for name, fn in cases.items():
+            out[name] = round(ns_per_op(fn), 1)
+        return out
+    finally:
+        database.catalog_manager.current = previous
+
+
+def run(sizes=SIZES) -> dict:
+    return {str(n): bench_size(n) for n in sizes}
+
+
+def print_table(results: dict):
+    sizes = list(results)
+    names = list(next(iter(results.values())))
+    print(f"{'ns/op':<34}" + "".join(f"{n + ' rec':>14}" for n in sizes))
+    for name in names:
+        unit = "" if name != "catalog_build_ms" else " (ms)"
+        print(f"{name + unit:<34}" + "".join(f"{results[n][name]:>14,.1f}" for n in sizes))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default=",".join(map(str, SIZES)))
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+    results = run(tuple(int(s) for s in args.sizes.split(",")))
+    print_table(results)
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+# Middleware overhead: BaseHTTPMiddleware (previous implementation) vs pure ASGI.
+#
+#   python bench/middleware_bench.py [--requests 2000]
+#
+# Drives the ASGI app in-process (no sockets) so the numbers isolate the
+# middleware stack rather than the network or server.
+import argparse
+import asyncio
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.chdir(ROOT)
+_tmp = tempfile.mkdtemp(prefix="myuni-bench-")
+atexit.register(shutil.rmtree, _tmp, ignore_errors=True)
+# Must be set before the app modules read them: keep the bench off the real data files
+os.environ.setdefault("MYUNI_DB", os.path.join(_tmp, "myuni.db"))
+os.environ.setdefault("SUBMISSIONS_PATH", os.path.join(_tmp, "submissions.jsonl"))
+os.environ.setdefault("IMAGE_SYNC_STATE", os.path.join(_tmp, "image-sync.json"))
+# Not the server's shared directory: /metrics on a live server would sum the bench's counters
+os.environ.setdefault("METRICS_DIR", os.path.join(_tmp, "metrics"))
+
+from starlette.applications import Starlette  # noqa: E402
+from starlette.middleware import Middleware  # noqa: E402
+from starlette.middleware.base import BaseHTTPMiddleware  # noqa: E402
+from starlette.responses import PlainTextResponse  # noqa: E402
+
+import app as myuni  # noqa: E402
+from middleware import SecurityHeadersMiddleware, RateLimitMiddleware  # noqa: E402
+from ratelimit import RateLimiter  # noqa: E402
+
+
+class LegacySecurityHeaders(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        response = await call_next(request)
+        response.headers.setdefault("X-Content-Type-Options", "nosniff")
+        response.headers.setdefault("X-Frame-Options", "DENY")
+        response.headers.setdefault("Referrer-Policy", "no-referrer-when-downgrade")
+        csp = (  # rebuilt on every call, as before
+            "default-src 'self'; "
+            "img-src 'self' data: https:; "
+            "style-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net; "
+            "script-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net; "
+            "font-src 'self' data: https://cdn.jsdelivr.net; "
+            "object-src 'none'; frame-ancestors 'none'"
+        )
+        response.headers.setdefault("Content-Security-Policy", csp)
+        return response
+
+
+class LegacyRateLimit(BaseHTTPMiddleware):
+    def __init__(self, app, limit, window_seconds):
+        super().__init__(app)
+        self.limiter = RateLimiter(limit, window_seconds, rules=())
+
+    async def dispatch(self, request, call_next):
+        ip = request.client.host if request.client else "anon"
+        decision = self.limiter.hit(request.method, request.url.path, ip)
+        if not decision.allowed:
+            return PlainTextResponse("Too Many Requests", status_code=429)
+        response = await call_next(request)
+        response.headers["X-RateLimit-Limit"] = str(decision.limit)
+        response.headers["X-RateLimit-Remaining"] = str(decision.remaining)
+        return response
+
+
+def build(kind: str):
+    # Same routes as the real app; limits high enough that nothing is rejected
+    if kind == "base":
+        mw = [Middleware(LegacyRateLimit, limit=10**9, window_seconds=60), Middleware(LegacySecurityHeaders)]
+    else:
+        mw = [Middleware(RateLimitMiddleware, limit=10**9, window_seconds=60, rules=()),
+              Middleware(SecurityHeadersMiddleware)]
+    return Starlette(routes=myuni.app.routes, middleware=mw)
+
+
+async def call(app, path: str) -> int:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+        "root_path": "", "headers": [(b"host", b"localhost")], "client": ("127.0.0.1", 50000),
+        "server": ("localhost", 80),
+    }
+    status = 0
+    sent_body = False
+
+    async def receive():
+        nonlocal sent_body
+        if not sent_body:
+            sent_body = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.Event().wait()  # client never disconnects; cancelled when the response ends
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+async def measure(app, path: str, n: int) -> float:
+    for _ in range(min(50, n)):  # warm-up
+        await call(app, path)
+    start = time.perf_counter()
+    for _ in range(n):
+        assert await call(app, path) == 200
+    return n / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+    image = next(p.name for p in sorted(Path("static/images").glob("*.jpg")))
+    paths = ["/", f"/static/images/{image}"]
+    print(f"{'path':<45}{'BaseHTTPMiddleware':>20}{'pure ASGI':>12}{'speedup':>10}")
+    for path in paths:
+        before = asyncio.run(measure(build("base"), path, args.requests))
+        after = asyncio.run(measure(build("asgi"), path, args.requests))
+        print(f"{path:<45}{before:>16.0f} r/s{after:>8.0f} r/s{after / before:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# Catalog record layout: augmented dicts + per-request copies (previous) vs University records.
+#
+#   python bench/records_bench.py [--records 10000] [--rounds 2000]
+#
+# Reports memory per record, and per-request time/allocations for preparing and
+# rendering a /universities page (12 cards) and a favorites page (50 saved).
+import argparse
+import atexit
+import gc
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from urllib.parse import quote_plus
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "bench"))
+os.chdir(ROOT)
+_tmp = tempfile.mkdtemp(prefix="myuni-bench-")
+atexit.register(shutil.rmtree, _tmp, ignore_errors=True)
+# Must be set before the app modules read them: keep the bench off the real data files
+os.environ.setdefault("MYUNI_DB", os.path.join(_tmp, "myuni.db"))
+os.environ.setdefault("SUBMISSIONS_PATH", os.path.join(_tmp, "submissions.jsonl"))
+os.environ.setdefault("IMAGE_SYNC_STATE", os.path.join(_tmp, "image-sync.json"))
+# Not the server's shared directory: /metrics on a live server would sum the bench's counters
+os.environ.setdefault("METRICS_DIR", os.path.join(_tmp, "metrics"))
+
+from database import University  # noqa: E402
+from derivatives import image_set  # noqa: E402
+from images import image_manifest  # noqa: E402
+from synthetic import make_catalog  # noqa: E402
+import app as myuni  # noqa: E402
+
+DEFAULT = "/static/images/default.svg"
+
+
+def dict_record(u: dict) -> dict:
+    # What database.py used to keep per entry
+    u = dict(u)
+    u["photo_url"] = "https://source.unsplash.com/featured/1200x800?university,campus," + quote_plus(f"{u['name']} {u['city']}")
+    return u
+
+
+def dict_page(page):
+    out = []
+    for u in page:
+        u2 = dict(u)
+        disp = u.get("photo_url") or image_manifest.resolve(u["slug"], u.get("image", DEFAULT))
+        u2["display_image"] = disp
+        u2["image_set"] = image_set(u["slug"], disp)
+        out.append(u2)
+    return out
+
+
+def dict_favorites(records, slugs):
+    items = []
+    for u in records:
+        if u.get("slug") in slugs:
+            u2 = dict(u)
+            u2["local_image"] = image_manifest.resolve(u["slug"], u.get("image", DEFAULT))
+            u2["image_set"] = image_set(u["slug"], u2["local_image"])
+            items.append(u2)
+    return items
+
+
+def record_page(page):
+    return page
+
+
+def record_favorites(records, slugs):
+    return [u for u in records if u.slug in slugs]
+
+
+def build_size(build, text):
+    # Memory still held once the parsed JSON is gone: parse + build, then drop the input
+    gc.collect()
+    tracemalloc.start()
+    raw = json.loads(text)
+    records = tuple(build(u) for u in raw)
+    del raw
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return records, size
+
+
+def per_call(fn, rounds):
+    fn()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    elapsed = (time.perf_counter() - start) / rounds
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+    raw = make_catalog(args.records)
+    env = myuni.templates.env
+    cards = env.get_template("universities.html")
+    favs = env.get_template("favorites.html")
+
+    print(f"{args.records} records")
+    print(f"{'layout':<12}{'bytes/record':>14}")
+    layouts = {}
+    shared = {}  # as Catalog does: equal tuples/sets are stored once per snapshot
+    for name, build in (("dict", dict_record), ("University", lambda u: University(u, shared))):
+        records, size = build_size(build, json.dumps(raw))
+        layouts[name] = records
+        print(f"{name:<12}{size / len(records):>14.0f}")
+
+    slugs = {u["slug"] for u in raw[::args.records // 50 or 1][:50]}
+    print(f"\n{'operation':<28}{'layout':<12}{'us/call':>10}{'peak alloc':>12}")
+    for name, page_fn, fav_fn in (("dict", dict_page, dict_favorites), ("University", record_page, record_favorites)):
+        records = layouts[name]
+        page = records[120:132]
+        ctx = {"city": "Dubai", "cities": ("Dubai",), "q": "", "programs": (), "match_all": False, "program_options": (),
+               "page_query": "city=Dubai", "total_count": len(records),
+               "page": 11, "total_pages": len(records) // 12, "page_size": 12, "request": None}
+        ops = (
+            ("prepare /universities page", lambda: page_fn(page)),
+            ("render /universities page", lambda: cards.render(ctx, universities=page_fn(page))),
+            ("prepare favorites (50)", lambda: fav_fn(records, slugs)),
+            ("render favorites (50)", lambda: favs.render(request=None, user={"name": "x"}, items=fav_fn(records, slugs))),
+        )
+        for label, fn in ops:
+            rounds = args.rounds if "render" not in label and "favorites" not in label else max(1, args.rounds // 10)
+            secs, peak = per_call(fn, rounds)
+            print(f"{label:<28}{name:<12}{secs * 1e6:>10.1f}{peak:>12}")
+
+
+if __name__ == "__main__":
+    main()
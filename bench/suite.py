@@ -0,0 +1,98 @@
+# Runs bench/micro.py and bench/load.py and saves the results as JSON for comparison between commits.
+#
+#   python bench/suite.py [--quick] [--out FILE] [--compare bench/results/<other>.json]
+#
+# Results go to bench/results/<git sha>.json (suffixed "-dirty" for uncommitted
+# trees). --compare prints the % change of every metric against an earlier file;
+# for times lower is better, for req/s higher is better. Changes under NOISE are
+# not flagged.
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "bench"))
+os.chdir(ROOT)
+
+import load  # noqa: E402
+import micro  # noqa: E402
+
+RESULTS_DIR = ROOT / "bench" / "results"
+# Sub-millisecond in-process timings move by several % between identical runs
+NOISE = 0.10
+
+
+def _git(*args) -> str:
+    try:
+        return subprocess.run(["git", *args], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def meta() -> dict:
+    sha = _git("rev-parse", "--short=12", "HEAD") or "unknown"
+    dirty = bool(_git("status", "--porcelain", "--untracked-files=no"))
+    return {
+        "commit": sha + ("-dirty" if dirty else ""),
+        "subject": _git("log", "-1", "--format=%s"),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def _flatten(results: dict, prefix: str = ""):
+    for key, value in results.items():
+        if isinstance(value, dict):
+            yield from _flatten(value, f"{prefix}{key} / ")
+        elif isinstance(value, (int, float)) and key not in ("requests", "errors", "max_ms"):
+            yield f"{prefix}{key}", value
+
+
+def compare(current: dict, baseline: dict):
+    print(f"\nvs {baseline['meta']['commit']} ({baseline['meta']['timestamp']})")
+    old = dict(_flatten({k: baseline[k] for k in ("micro", "load") if k in baseline}))
+    for name, value in _flatten({k: current[k] for k in ("micro", "load")}):
+        before = old.get(name)
+        if not before:
+            continue
+        change = (value - before) / before
+        better = change > 0 if name.endswith("rps") else change < 0
+        flag = "" if abs(change) < NOISE else ("  better" if better else "  WORSE")
+        print(f"{name:<60}{before:>14,.3f}{value:>14,.3f}{change:>+9.1%}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--quick", action="store_true", help="smaller sizes and request counts (smoke run)")
+    parser.add_argument("--out", help="results file (default: bench/results/<sha>.json)")
+    parser.add_argument("--compare", help="earlier results file to diff against")
+    args = parser.parse_args()
+
+    sizes = (50, 5000) if args.quick else micro.SIZES
+    requests = 300 if args.quick else 2000
+    results = {"meta": meta()}
+    print(f"micro: sizes {', '.join(map(str, sizes))}")
+    results["micro"] = micro.run(sizes)
+    micro.print_table(results["micro"])
+    print(f"\nload: {requests} requests per scenario, concurrency 16")
+    results["load"] = load.run(requests, 16)
+    load.print_table(results["load"])
+
+    out = Path(args.out) if args.out else RESULTS_DIR / f"{results['meta']['commit']}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(results, indent=2))
+    print(f"\nwrote {out}")
+    if args.compare:
+        compare(results, json.loads(Path(args.compare).read_text()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+# Synthetic catalogs for benchmarks: realistic field sizes, any number of records
+import json
+import random
+
+CITIES = ("Dubai", "Abu Dhabi", "Sharjah", "Ajman", "Ras Al Khaimah", "Fujairah", "Umm Al Quwain", "Al Ain")
+PROGRAMS = ("Business", "Engineering", "IT", "Computer Science", "Medicine", "Nursing", "Law", "Architecture",
+            "Design", "Media", "Education", "Pharmacy", "Aviation", "Hospitality", "Finance", "Psychology")
+WORDS = ("global", "american", "british", "institute", "college", "technology", "science", "academy",
+         "royal", "national", "emirates", "gulf", "international", "modern", "applied", "health")
+
+
+def make_catalog(n: int, seed: int = 42) -> list:
+    rnd = random.Random(seed)
+    records = []
+    for i in range(n):
+        words = rnd.sample(WORDS, 2)
+        city = rnd.choice(CITIES)
+        name = f"{words[0].title()} {words[1].title()} University {i}"
+        records.append({
+            "slug": f"{words[0]}-{words[1]}-university-{i}",
+            "name": name,
+            "city": city,
+            "image": "",
+            "description": f"{name} in {city} offers " + " ".join(rnd.choices(WORDS, k=24)) + ".",
+            "requirements": ["High school diploma (or equivalent)", "Official transcripts",
+                             "English proficiency (IELTS 6.0 / TOEFL iBT 80)", "Valid ID/Passport"],
+            "programs": rnd.sample(PROGRAMS, rnd.randint(2, 6)),
+        })
+    return records
+
+
+def write_catalog(path, n: int, seed: int = 42):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(make_catalog(n, seed), f)
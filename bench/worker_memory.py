@@ -0,0 +1,91 @@
+# Per-worker memory with and without gunicorn preload_app on a large synthetic catalog.
+#
+#   python bench/worker_memory.py [--records 20000] [--workers 4]
+#
+# Linux only (reads /proc/<pid>/smaps_rollup). Each mode starts gunicorn with
+# gunicorn_conf.py, sends some catalog traffic, then reports per-worker RSS,
+# PSS (shared pages split between processes) and private (unshared) memory.
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "bench"))
+
+from synthetic import write_catalog  # noqa: E402
+
+PATHS = ("/", "/universities?city=Dubai", "/universities?q=global+college", "/universities?program=Law&page=3")
+
+
+def smaps(pid: int) -> dict:
+    out = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if rest.strip().endswith("kB"):
+                out[key] = int(rest.split()[0])
+    return out
+
+
+def children(pid: int) -> list:
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(p) for p in f.read().split()]
+
+
+def run(preload: bool, args, tmp: Path) -> list:
+    env = dict(os.environ, GUNICORN_PRELOAD="1" if preload else "0", CATALOG_PATH=str(tmp / "universities.json"),
+               MYUNI_DB=str(tmp / "myuni.db"), SUBMISSIONS_PATH=str(tmp / "submissions.jsonl"),
+               IMAGE_SYNC_STATE=str(tmp / "image-sync.json"), IMAGE_SYNC_DELAY="3600",
+               METRICS_DIR=str(tmp / "metrics"))  # gunicorn's on_starting clears this directory
+    port = 8600 + preload
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn_conf.py", "-w", str(args.workers),
+         "-b", f"127.0.0.1:{port}", "--access-logfile", "/dev/null", "app:app"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.time() + 120
+        while True:
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=2).read()
+                if len(children(proc.pid)) == args.workers:
+                    break
+            except OSError:
+                pass
+            if time.time() > deadline or proc.poll() is not None:
+                raise RuntimeError("gunicorn did not come up")
+            time.sleep(0.5)
+        time.sleep(2)  # let every worker finish its lifespan startup
+        for _ in range(args.requests):
+            for path in PATHS:
+                urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=10).read()
+        return [smaps(pid) for pid in children(proc.pid)]
+    finally:
+        proc.terminate()
+        proc.wait(30)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=25, help="rounds of catalog requests before measuring")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        write_catalog(tmp / "universities.json", args.records)
+        print(f"{args.records} records, {args.workers} workers (MiB per worker, mean)")
+        print(f"{'mode':<12}{'RSS':>8}{'PSS':>8}{'private':>9}")
+        for preload in (False, True):
+            stats = run(preload, args, tmp)
+            mean = lambda key: sum(s.get(key, 0) for s in stats) / len(stats) / 1024  # noqa: E731
+            private = sum(s.get("Private_Clean", 0) + s.get("Private_Dirty", 0) for s in stats) / len(stats) / 1024
+            print(f"{'preload' if preload else 'no preload':<12}{mean('Rss'):>8.1f}{mean('Pss'):>8.1f}{private:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
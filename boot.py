@@ -0,0 +1,30 @@
+# Startup phase timing: app.py calls mark() after each boot step and report() once ready
+import logging
+import os
+import time
+
+log = logging.getLogger("myuni.boot")
+
+_start = _last = time.perf_counter()
+phases = []  # (name, seconds)
+
+
+def mark(name: str):
+    """Close the phase that started at the previous mark (or at import of this module)."""
+    global _last
+    now = time.perf_counter()
+    phases.append((name, now - _last))
+    _last = now
+
+
+def forked():
+    """Restart the clock in a worker forked from a preloaded master."""
+    global _start, _last
+    _start = _last = time.perf_counter()
+    phases[:] = [("preloaded", 0.0)]
+
+
+def report(what: str = "worker"):
+    total = time.perf_counter() - _start
+    detail = ", ".join(f"{name} {secs * 1000:.0f}ms" for name, secs in phases)
+    log.info("%s %d ready in %.0fms: %s", what, os.getpid(), total * 1000, detail)
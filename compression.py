@@ -0,0 +1,78 @@
+# Content-encoding helpers shared by the compression middleware, the page cache and static assets
+import gzip
+import os
+import zlib
+from functools import lru_cache
+
+try:
+    import brotli
+except Exception:  # optional: without it only gzip is offered
+    brotli = None
+
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+# Per-request (streaming / uncached) levels favour speed; cached page bodies are
+# compressed once, so they can afford denser settings.
+GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", "4"))
+CACHED_GZIP_LEVEL = 9
+CACHED_BROTLI_QUALITY = 7
+
+# Preferred first
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "application/xml",
+                      "application/manifest+json", "image/svg+xml")
+
+
+def is_compressible(content_type: str) -> bool:
+    return content_type.lower().startswith(COMPRESSIBLE_TYPES)
+
+
+@lru_cache(maxsize=256)
+def negotiate(accept_encoding: str, offered=ENCODINGS):
+    """Pick the first of `offered` the client accepts (q > 0), or None for identity."""
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[token.strip().lower()] = q
+    star = accepted.get("*", 0.0)
+    for encoding in offered:
+        if accepted.get(encoding, star) > 0:
+            return encoding
+    return None
+
+
+def compress(data: bytes, encoding: str, cached: bool = False) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=CACHED_BROTLI_QUALITY if cached else BROTLI_QUALITY)
+    return gzip.compress(data, CACHED_GZIP_LEVEL if cached else GZIP_LEVEL, mtime=0)
+
+
+class StreamCompressor:
+    """Incremental encoder; every chunk is flushed so streamed output is not held back."""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._c = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._c = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._c.process(data) + self._c.flush()
+        return self._c.compress(data) + self._c.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._c.finish()
+        return self._c.flush(zlib.Z_FINISH)
@@ -1,24 +1,57 @@
-# Rich university data for UI and details
+# Rich university data for UI and details.
+# The catalog is an immutable snapshot (records + indexes) behind CatalogManager,
+# which reloads data/universities.json when it changes and swaps snapshots atomically.
+import hashlib
 import json
+import logging
+import os
+import sys
+import threading
+from collections import namedtuple
 from pathlib import Path
 from urllib.parse import quote_plus
 
+from derivatives import image_set
+from images import DEFAULT_IMAGE, image_manifest
+from search import SearchIndex, Suggester
+
+log = logging.getLogger("myuni.catalog")
+
+CATALOG_PATH = Path(os.getenv("CATALOG_PATH", "data/universities.json"))
+CATALOG_POLL_SECONDS = float(os.getenv("CATALOG_POLL_SECONDS", "2"))
+
+
+def _load_external_data(path: Path = CATALOG_PATH):
+    """Parse and validate the catalog file; raises ValueError/OSError on bad input."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    _validate(data)
+    return data
 
-def _load_external_data():
-    data_path = Path("data/universities.json")
-    if data_path.exists():
-        try:
-            with open(data_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            # Basic validation
-            if isinstance(data, list):
-                return data
-        except Exception:
-            pass
-    return None
 
+def _validate(data):
+    if not isinstance(data, list):
+        raise ValueError("catalog must be a JSON list")
+    seen = set()
+    for i, u in enumerate(data):
+        if not isinstance(u, dict):
+            raise ValueError(f"entry {i} is not an object")
+        for field in ("slug", "name", "city"):
+            if not isinstance(u.get(field), str) or not u[field].strip():
+                raise ValueError(f"entry {i} has no {field}")
+        for field in ("image", "description"):
+            if not isinstance(u.get(field, ""), str):
+                raise ValueError(f"entry {i}: {field} must be a string")
+        for field in ("programs", "requirements"):
+            value = u.get(field, [])
+            if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+                raise ValueError(f"entry {i}: {field} must be a list of strings")
+        if u["slug"] in seen:
+            raise ValueError(f"duplicate slug {u['slug']!r}")
+        seen.add(u["slug"])
 
-universities = _load_external_data() or [
+
+_DEFAULT_UNIVERSITIES = [
     {
         "slug": "university-of-dubai",
         "name": "University of Dubai",
@@ -359,36 +392,381 @@ _DOMAIN_BY_SLUG = {
     "hct-sharjah": "hct.ac.ae",
 }
 
-for u in universities:
-    # Attach a photo-style Unsplash URL for visual cards
-    try:
-        q = f"{u.get('name','')} {u.get('city','')}".strip()
-        uq = quote_plus(q)
-        u["photo_url"] = f"https://source.unsplash.com/featured/1200x800?university,campus,{uq}"
-    except Exception:
-        pass
-    # If no image set, try a logo as a backup
-    if not u.get("image"):
-        slug = u.get("slug")
-        domain = _DOMAIN_BY_SLUG.get(slug)
-        if domain:
-            u["image"] = f"https://logo.clearbit.com/{domain}"
+def _compact(value):
+    # Interned strings and tuples: repeated cities/programs share one object, and
+    # snapshots built before a fork stay on shared copy-on-write pages
+    if isinstance(value, str):
+        return sys.intern(value)
+    if isinstance(value, list):
+        return tuple(_compact(v) for v in value)
+    return value
+
+
+def _city_key(city: str) -> str:
+    return (city or "").casefold()
+
+
+class University:
+    """One catalog entry: immutable, slots-based, derived fields computed once at load.
+
+    Templates read attributes directly, so views pass records through without
+    per-request dict copies. Fields not known here are kept in `extra`.
+    """
+
+    __slots__ = ("slug", "name", "city", "image", "description", "requirements", "programs",
+                 "photo_url", "city_key", "program_set", "extra")
+
+    FIELDS = ("slug", "name", "city", "image", "description", "requirements", "programs")
+
+    def __init__(self, data: dict, shared: dict = None):
+        # `shared` dedupes equal tuples/sets across the records of one snapshot
+        shared = {} if shared is None else shared
+        init = object.__setattr__
+        for field in self.FIELDS:
+            value = _compact(data.get(field, () if field in ("requirements", "programs") else ""))
+            if isinstance(value, tuple):
+                value = shared.setdefault(value, value)
+            init(self, field, value)
+        extra = {sys.intern(k): _compact(v) for k, v in data.items() if k not in self.FIELDS and k != "photo_url"}
+        init(self, "extra", extra or None)
+        # If no image set, try a logo as a backup
+        if not self.image:
+            domain = _DOMAIN_BY_SLUG.get(self.slug)
+            if domain:
+                init(self, "image", f"https://logo.clearbit.com/{domain}")
+        # Photo-style Unsplash URL for visual cards
+        uq = quote_plus(f"{self.name} {self.city}".strip())
+        init(self, "photo_url", f"https://source.unsplash.com/featured/1200x800?university,campus,{uq}")
+        init(self, "city_key", sys.intern(_city_key(self.city)))
+        program_set = frozenset(self.programs)
+        init(self, "program_set", shared.setdefault(program_set, program_set))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("University records are immutable")
+
+    def __repr__(self):
+        return f"University({self.slug!r})"
+
+    @property
+    def display_image(self) -> str:
+        # Prefer the photo for display; fallback to local-or-remote logo/default
+        return self.photo_url or image_manifest.resolve(self.slug, self.image or DEFAULT_IMAGE)
+
+    @property
+    def image_set(self) -> dict:
+        # Only built for records being rendered (and rendered pages are cached)
+        return image_set(self.slug, self.display_image)
+
+    @property
+    def local_image(self) -> str:
+        # Cached copy in static/images if present, else the remote logo/default
+        return image_manifest.resolve(self.slug, self.image or DEFAULT_IMAGE)
+
+    @property
+    def local_image_set(self) -> dict:
+        return image_set(self.slug, self.local_image)
+
+
+def _bitset(positions, size: int) -> int:
+    # One "0"/"1" digit per record, parsed in one go: OR-ing bits into an int one
+    # by one copies it every time, and byte/shift arithmetic per position is slower
+    if not size:
+        return 0
+    digits = bytearray(b"0" * size)
+    for i in positions:
+        digits[i] = 49  # "1"
+    digits.reverse()
+    return int(digits, 2)
+
+
+def _bit_positions(bits: int, start: int = 0, stop: int = None):
+    """Indexes of the set bits of `bits`, lowest first, from the start-th to the stop-th."""
+    s = bin(bits)[:1:-1]  # reversed, so s[i] is bit i
+    out = []
+    pos = n = 0
+    # Skip whole blocks before the start-th bit (deep pages) with C-speed counts
+    while pos < len(s):
+        block = s.count("1", pos, pos + 4096)
+        if n + block > start:
+            break
+        n += block
+        pos += 4096
+    pos = s.find("1", pos)
+    while pos >= 0 and (stop is None or n < stop):
+        if n >= start:
+            out.append(pos)
+        n += 1
+        pos = s.find("1", pos + 1)
+    return out
+
+
+class CatalogIndex:
+    """Lookup tables derived once from the catalog so request paths avoid full scans.
+
+    `city_bits` and `program_bits` are bitsets over record positions (bit i is
+    records[i]), so multi-city / multi-program filters and facet counts are a few
+    big-int AND/OR and bit_count() calls instead of per-record loops.
+    """
+
+    __slots__ = (
+        "by_slug", "by_city", "programs_by_city", "by_city_program", "cities", "city_set",
+        "by_program", "all_programs", "all_bits", "city_bits", "program_bits",
+    )
+
+    def __init__(self, records):
+        by_slug = {}
+        by_city = {}
+        by_city_program = {}
+        by_program = {}
+        city_positions = {}
+        program_positions = {}
+        cities = set()
+        for i, u in enumerate(records):
+            if u.slug and u.slug not in by_slug:
+                by_slug[u.slug] = u
+            for p in u.programs:
+                by_program.setdefault(p, []).append(u)
+                program_positions.setdefault(p, []).append(i)
+            if not u.city:
+                continue
+            cities.add(u.city)
+            city_positions.setdefault(u.city_key, []).append(i)
+            by_city.setdefault(u.city_key, []).append(u)
+            progs = by_city_program.setdefault(u.city_key, {})
+            for p in u.programs:
+                progs.setdefault(p, []).append(u)
+        self.by_slug = by_slug
+        self.by_city = {k: tuple(v) for k, v in by_city.items()}
+        self.by_city_program = {
+            k: {p: tuple(v) for p, v in progs.items()} for k, progs in by_city_program.items()
+        }
+        self.programs_by_city = {k: tuple(sorted(progs)) for k, progs in by_city_program.items()}
+        self.cities = tuple(sorted(cities))
+        self.city_set = frozenset(cities)
+        self.by_program = {p: tuple(v) for p, v in by_program.items()}
+        self.all_programs = tuple(sorted(by_program))
+        n = len(records)
+        self.all_bits = (1 << n) - 1
+        self.city_bits = {k: _bitset(v, n) for k, v in city_positions.items()}
+        self.program_bits = {p: _bitset(v, n) for p, v in program_positions.items()}
+
+
+# One page of a faceted listing; `facets` is ((program, count), ...) in name order
+Selection = namedtuple("Selection", "records total facets")
+
+
+class Catalog:
+    """One catalog snapshot. Never mutated after construction, so a request that
+    holds a reference sees consistent records and indexes across a reload."""
+
+    __slots__ = ("records", "index", "search_index", "suggester", "version", "generation")
+
+    def __init__(self, records, generation: int = 0):
+        shared = {}
+        self.records = tuple(University(u, shared) for u in records)
+        self.index = CatalogIndex(self.records)
+        # Content hash: identical in every worker, so usable in page-cache keys and ETags
+        self.version = hashlib.sha256(json.dumps(records, sort_keys=True).encode()).hexdigest()[:16]
+        self.search_index = SearchIndex(self.records)
+        self.suggester = Suggester(self.records)
+        self.generation = generation
+
+    def universities_by_city(self, city: str):
+        return self.index.by_city.get(_city_key(city), ())
+
+    def universities_by_program(self, city: str, program: str):
+        if not city:
+            return self.index.by_program.get(program, ())
+        return self.index.by_city_program.get(_city_key(city), {}).get(program, ())
+
+    def university(self, slug: str):
+        return self.index.by_slug.get(slug)
+
+    def universities(self, slugs):
+        """Records for `slugs` in the given order; unknown slugs are skipped."""
+        return [u for u in map(self.index.by_slug.get, slugs) if u is not None]
+
+    def programs(self, city: str):
+        if not city:
+            return self.index.all_programs
+        return self.index.programs_by_city.get(_city_key(city), ())
+
+    def is_known_city(self, city: str) -> bool:
+        return city in self.index.city_set
+
+    def search(self, query: str, city: str = None, program: str = None):
+        """Relevance-ranked search, optionally restricted to a city and/or program."""
+        ids, scores = self.search_index.match(query)
+        records = self.records
+        if city:
+            key = _city_key(city)
+            ids = [d for d in ids if records[d].city_key == key]
+        if program:
+            ids = [d for d in ids if program in records[d].program_set]
+        return self.search_index.rank(ids, scores) if ids else []
+
+    def suggest(self, prefix: str, city: str = None, limit: int = 8):
+        return self.suggester.suggest(prefix, city=city, limit=limit)
+
+    def select(self, cities=(), programs=(), match_all: bool = False, query: str = "",
+               start: int = 0, stop: int = None) -> Selection:
+        """Records in any of `cities` offering any (or, with match_all, every) of `programs`.
+
+        Facet counts say how many records each program would give: within the
+        city/query selection for "any" (so picking another program widens it), and
+        within the current result for "all" (picking another one narrows it).
+        Without a query, records come in catalog order; with one, by relevance.
+        """
+        index = self.index
+        base = index.all_bits
+        if cities:
+            base = 0
+            for city in cities:
+                base |= index.city_bits.get(_city_key(city), 0)
+        scores = None
+        if query:
+            # Search hits become one more bitset; only the requested page gets ranked
+            ids, scores = self.search_index.match(query)
+            hit_bits = _bitset(ids, len(self.records))
+            base &= hit_bits
+        bits = base
+        if programs:
+            bits = index.all_bits if match_all else 0
+            for p in programs:
+                if match_all:
+                    bits &= index.program_bits.get(p, 0)
+                else:
+                    bits |= index.program_bits.get(p, 0)
+            bits &= base
+        within = bits if match_all else base
+        facets = []
+        for p in index.all_programs:
+            count = (index.program_bits[p] & within).bit_count()
+            if count or p in programs:
+                facets.append((p, count))
+        records = self.records
+        if scores is not None:
+            survivors = ids if bits == hit_bits else _bit_positions(bits)
+            page = self.search_index.rank(survivors, scores, stop)[start:stop] if bits else []
+        else:
+            page = [records[i] for i in _bit_positions(bits, start, stop)]
+        return Selection(page, bits.bit_count(), tuple(facets))
+
+
+class CatalogManager:
+    """Holds the current Catalog and replaces it when the catalog file changes.
+
+    A polling watcher (same approach as the image manifest) compares the file's
+    mtime/size/inode; parsing, validation and index building happen on the watcher
+    thread, then `current` is swapped in a single assignment. A file that fails
+    validation is logged and ignored, and the previous snapshot stays live.
+    """
+
+    def __init__(self, path: Path = CATALOG_PATH):
+        self.path = Path(path)
+        self.current = None
+        self.generation = 0
+        self._stat = None
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._watcher = None
+        self._pid = None
+        self._stop = threading.Event()
+
+    def _file_stat(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def load(self) -> bool:
+        """(Re)load the catalog file; returns True if a new snapshot was swapped in."""
+        with self._lock:
+            stat = self._file_stat()
+            try:
+                # Building the snapshot is inside the try too: anything a bad file
+                # makes it raise must leave the previous catalog live
+                snapshot = Catalog(_load_external_data(self.path), generation=self.generation + 1)
+            except Exception as exc:  # OSError, ValueError (incl. malformed JSON), ...
+                if stat is not None:
+                    log.warning("could not load catalog from %s: %s", self.path, exc)
+                if self.current is not None:
+                    self._stat = stat  # retried once the file changes again
+                    return False
+                snapshot = Catalog(_DEFAULT_UNIVERSITIES, generation=self.generation + 1)
+            self._stat = stat
+            if self.current is not None and snapshot.version == self.current.version:
+                return False
+            self.generation = snapshot.generation
+            self.current = snapshot
+        if snapshot.generation > 1:
+            log.info("catalog reloaded: version %s, %d records", snapshot.version, len(snapshot.records))
+        for callback in self._listeners:
+            try:
+                callback(snapshot)
+            except Exception:
+                log.exception("catalog listener failed")
+        return True
+
+    def subscribe(self, callback):
+        """Call `callback(catalog)` after every swap (on the watcher thread)."""
+        self._listeners.append(callback)
+
+    def start_watcher(self, interval: float = CATALOG_POLL_SECONDS):
+        if self._watcher is not None and self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name="catalog-watch", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        self._stop.set()
+
+    def _watch(self, interval):
+        while not self._stop.wait(interval):
+            stat = self._file_stat()
+            if stat is not None and stat != self._stat:
+                try:
+                    self.load()
+                except Exception:  # keep watching; the next edit may fix it
+                    log.exception("catalog reload failed")
+
+
+catalog_manager = CatalogManager()
+catalog_manager.load()
+
+
+def catalog() -> Catalog:
+    """The current snapshot; grab it once per request and use it throughout."""
+    return catalog_manager.current
+
 
 def get_universities_by_city(city: str):
-    return [u for u in universities if u["city"].lower() == (city or "").lower()]
+    return catalog_manager.current.universities_by_city(city)
+
+def get_universities_by_program(city: str, program: str):
+    return catalog_manager.current.universities_by_program(city, program)
 
 def get_university_by_slug(slug: str):
-    for u in universities:
-        if u["slug"] == slug:
-            return u
-    return None
+    return catalog_manager.current.university(slug)
 
 def get_programs_by_city(city: str):
-    opts = set()
-    for u in get_universities_by_city(city):
-        for p in u.get("programs", []):
-            opts.add(p)
-    return sorted(opts)
+    return catalog_manager.current.programs(city)
+
+def get_program_counts(city: str = None):
+    """((program, number of universities), ...) for a city, or the whole catalog."""
+    return catalog_manager.current.select(cities=(city,) if city else (), stop=0).facets
 
 def get_cities():
-    return sorted({u.get("city") for u in universities if u.get("city")})
+    return catalog_manager.current.index.cities
+
+def is_known_city(city: str) -> bool:
+    return catalog_manager.current.is_known_city(city)
+
+def search_universities(query: str, city: str = None, program: str = None):
+    return catalog_manager.current.search(query, city=city, program=program)
+
+def suggest_universities(prefix: str, city: str = None, limit: int = 8):
+    return catalog_manager.current.suggest(prefix, city=city, limit=limit)
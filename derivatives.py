@@ -0,0 +1,133 @@
+# Responsive image derivatives: resized WebP/AVIF/JPEG variants with content-hashed names
+#
+#   pip install Pillow
+#   python derivatives.py            # build/refresh static/images/derived
+#
+# The build is offline and incremental (unchanged sources are skipped). At runtime
+# the app only reads derived/manifest.json to fill <picture>/srcset markup.
+import hashlib
+import io
+import json
+import sys
+from pathlib import Path
+from urllib.parse import urlsplit, urlunsplit
+
+from images import IMAGES_DIR, IMAGES_URL
+
+DERIVED_DIR = IMAGES_DIR / "derived"
+DERIVED_URL = f"{IMAGES_URL}/derived"
+MANIFEST_PATH = DERIVED_DIR / "manifest.json"
+WIDTHS = (320, 480, 800, 1200)
+# (manifest key, Pillow format, extension, MIME type, save options); best format first
+FORMATS = (
+    ("avif", "AVIF", "avif", "image/avif", {"quality": 50, "speed": 8}),
+    ("webp", "WEBP", "webp", "image/webp", {"quality": 75, "method": 6}),
+    ("jpeg", "JPEG", "jpg", "image/jpeg", {"quality": 78, "optimize": True, "progressive": True}),
+)
+SOURCE_EXTS = ("jpg", "jpeg", "png", "webp")
+
+# `sizes` hints matching the Bootstrap grid used by the templates
+CARD_SIZES = "(min-width: 992px) 400px, (min-width: 576px) 50vw, 100vw"
+DETAIL_SIZES = "(min-width: 992px) 58vw, 100vw"
+
+
+def load_manifest(path: Path = MANIFEST_PATH) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+manifest = load_manifest()
+
+
+def _unsplash_sized(url: str, width: int) -> str:
+    # source.unsplash.com/featured/<w>x<h>?... keeps a 3:2 crop at any width
+    parts = urlsplit(url)
+    path = parts.path.rsplit("/", 1)[0] + f"/{width}x{width * 2 // 3}"
+    return urlunsplit((parts.scheme, parts.netloc, path, parts.query, parts.fragment))
+
+
+def image_set(slug: str, display_url: str) -> dict:
+    """srcset data for a card/detail image, or {} when only a single URL is available.
+
+    Returns {"sources": [{"type", "srcset"}...], "srcset": fallback srcset}.
+    """
+    if display_url and display_url.startswith(IMAGES_URL + "/"):
+        entry = manifest.get(slug)
+        if not entry:
+            return {}
+        variants = entry["variants"]
+        sources = [
+            {"type": mime, "srcset": ", ".join(f"{url} {w}w" for w, url in variants[key])}
+            for key, _, _, mime, _ in FORMATS if key != "jpeg" and variants.get(key)
+        ]
+        fallback = ", ".join(f"{url} {w}w" for w, url in variants.get("jpeg", ()))
+        return {"sources": sources, "srcset": fallback}
+    if display_url and "source.unsplash.com/featured/" in display_url:
+        return {"sources": [], "srcset": ", ".join(f"{_unsplash_sized(display_url, w)} {w}w" for w in WIDTHS)}
+    return {}
+
+
+def _pick_sources(src_dir: Path) -> dict:
+    # One source per slug, preferring the same extension order as the image manifest
+    found = {}
+    for p in sorted(src_dir.iterdir()):
+        slug, _, ext = p.name.rpartition(".")
+        if ext in SOURCE_EXTS and p.is_file():
+            if slug not in found or SOURCE_EXTS.index(ext) < SOURCE_EXTS.index(found[slug].suffix[1:]):
+                found[slug] = p
+    return found
+
+
+def build(src_dir: Path = IMAGES_DIR, out_dir: Path = DERIVED_DIR) -> dict:
+    from PIL import Image, ImageOps, features
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    old = load_manifest(out_dir / "manifest.json")
+    formats = [f for f in FORMATS if f[0] == "jpeg" or features.check(f[0])]
+    result = {}
+    for slug, src in _pick_sources(src_dir).items():
+        st = src.stat()
+        stamp = {"source": src.name, "source_size": st.st_size, "source_mtime": int(st.st_mtime)}
+        prev = old.get(slug)
+        if prev and all(prev.get(k) == v for k, v in stamp.items()) and \
+                all((out_dir / url.rpartition("/")[2]).exists() for vs in prev["variants"].values() for _, url in vs):
+            result[slug] = prev
+            continue
+        with Image.open(src) as im:
+            im = ImageOps.exif_transpose(im)
+            im = im.convert("RGB")
+            variants = {key: [] for key, *_ in formats}
+            widths = [w for w in WIDTHS if w < im.width] + [min(im.width, WIDTHS[-1])]
+            for w in sorted(set(widths)):
+                resized = im.resize((w, max(1, round(im.height * w / im.width))), Image.LANCZOS)
+                for key, fmt, ext, _, opts in formats:
+                    buf = io.BytesIO()
+                    resized.save(buf, fmt, **opts)
+                    data = buf.getvalue()
+                    digest = hashlib.sha256(data).hexdigest()[:10]
+                    name = f"{slug}-{w}.{digest}.{ext}"
+                    target = out_dir / name
+                    if not target.exists():
+                        target.write_bytes(data)
+                    variants[key].append([w, f"{DERIVED_URL}/{name}"])
+        result[slug] = dict(stamp, variants=variants)
+        print(f"{slug}: {len(variants)} formats x {len(variants['jpeg'])} widths")
+    # Drop files no longer referenced by any manifest entry
+    keep = {url.rpartition("/")[2] for e in result.values() for vs in e["variants"].values() for _, url in vs}
+    for p in out_dir.iterdir():
+        if p.name != "manifest.json" and p.name not in keep:
+            p.unlink()
+    tmp = out_dir / "manifest.json.tmp"
+    tmp.write_text(json.dumps(result, indent=1, sort_keys=True), encoding="utf-8")
+    tmp.replace(out_dir / "manifest.json")
+    return result
+
+
+if __name__ == "__main__":
+    try:
+        build()
+    except ImportError:
+        sys.exit("Pillow is required to build image derivatives: pip install Pillow")
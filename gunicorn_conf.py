@@ -1,4 +1,8 @@
+import gc
+import logging
 import multiprocessing
+import os
+import sys
 
 bind = ":8000"
 workers = (multiprocessing.cpu_count() * 2) + 1
@@ -9,3 +13,46 @@ keepalive = 15
 accesslog = "-"
 errorlog = "-"
 loglevel = "info"
+
+# Preload: the master imports the app once (catalog, indexes, compiled templates)
+# and workers share those pages copy-on-write. GUNICORN_PRELOAD=0 restores
+# per-worker imports (needed for --reload during development).
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") != "0"
+if preload_app:
+    # No collections in the master while the app loads; see when_ready
+    gc.disable()
+
+
+def on_starting(server):
+    # Counters from a previous run must not be added to this one's
+    import metrics
+    metrics.clear()
+
+    # App loggers (myuni.*: startup timing, catalog reloads, image sync) share gunicorn's error log
+    app_log = logging.getLogger("myuni")
+    app_log.setLevel(logging.INFO)
+    for handler in logging.getLogger("gunicorn.error").handlers:
+        app_log.addHandler(handler)
+
+
+def when_ready(server):
+    if not preload_app:
+        return
+    if "app" in sys.modules:
+        import boot
+        import sqlite_store
+
+        # Connections opened during import (migrations) must not be shared with workers
+        sqlite_store.close_all()
+        boot.mark("master ready")
+        boot.report("master")
+    # Move everything allocated so far out of the collector's reach: GC passes in
+    # workers would otherwise write to every object header and un-share the pages.
+    # Collection then resumes for new objects in the master and in every worker.
+    gc.freeze()
+    gc.enable()
+
+
+def post_fork(server, worker):
+    if preload_app and "boot" in sys.modules:
+        sys.modules["boot"].forked()
@@ -0,0 +1,123 @@
+# In-memory manifest of locally cached university images (static/images)
+import os
+import threading
+from collections import namedtuple
+from pathlib import Path
+
+from metrics import image_cache_lookups
+
+IMAGES_DIR = Path("static/images")
+IMAGES_URL = "/static/images"
+DEFAULT_IMAGE = "/static/images/default.svg"
+ALLOWED_EXTS = ["jpg", "jpeg", "png", "webp", "svg"]
+# Files this small are failed/placeholder downloads, not real images
+MIN_IMAGE_BYTES = 2048
+
+ImageEntry = namedtuple("ImageEntry", "url size mtime")
+
+_image_hit = image_cache_lookups.labels("hit")
+_image_miss = image_cache_lookups.labels("miss")
+
+
+class ImageManifest:
+    """slug -> ImageEntry for static/images, so image resolution is a dict lookup.
+
+    Built with one directory scan at startup and kept current by `record()` (called
+    by the image prefetcher) and a polling watcher on the directory mtime.
+    `version` bumps on every change, for caches of output that embeds local image URLs.
+    """
+
+    def __init__(self, directory: Path = IMAGES_DIR, url_prefix: str = IMAGES_URL):
+        self.directory = Path(directory)
+        self.url_prefix = url_prefix
+        self.entries = {}
+        self.version = 0
+        self._dir_mtime = None
+        self._watcher = None
+        self._pid = None
+        self._stop = threading.Event()
+
+    def scan(self):
+        found = {}  # slug -> (ext rank, entry)
+        try:
+            self._dir_mtime = os.stat(self.directory).st_mtime_ns
+            dir_entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            dir_entries = []
+        for de in dir_entries:
+            slug, _, ext = de.name.rpartition(".")
+            if not slug or ext not in ALLOWED_EXTS or not de.is_file():
+                continue
+            st = de.stat()
+            if st.st_size <= MIN_IMAGE_BYTES:
+                continue
+            rank = ALLOWED_EXTS.index(ext)
+            if slug not in found or rank < found[slug][0]:
+                found[slug] = (rank, ImageEntry(f"{self.url_prefix}/{de.name}", st.st_size, st.st_mtime))
+        entries = {slug: e for slug, (_, e) in found.items()}
+        if entries != self.entries:
+            self.entries = entries
+            self.version += 1
+
+    def record(self, path: Path, replace: bool = False):
+        """Register (or refresh) a single file, e.g. right after downloading it.
+
+        With `replace`, the file wins even over a preferred extension (the caller
+        has removed the other variants).
+        """
+        path = Path(path)
+        slug, _, ext = path.name.rpartition(".")
+        if ext not in ALLOWED_EXTS:
+            return
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            return
+        if st.st_size <= MIN_IMAGE_BYTES:
+            return
+        current = self.entries.get(slug)
+        if current is not None and not replace and not current.url.endswith("/" + path.name):
+            # Keep the preferred extension if another variant already exists
+            if ALLOWED_EXTS.index(current.url.rpartition(".")[2]) < ALLOWED_EXTS.index(ext):
+                return
+        entries = dict(self.entries)
+        entries[slug] = ImageEntry(f"{self.url_prefix}/{path.name}", st.st_size, st.st_mtime)
+        self.entries = entries  # swap, so readers never see a half-updated dict
+        self.version += 1
+
+    def get(self, slug: str):
+        return self.entries.get(slug)
+
+    def resolve(self, slug: str, remote_url: str) -> str:
+        entry = self.entries.get(slug)
+        if entry:
+            _image_hit.inc()
+            return entry.url
+        _image_miss.inc()
+        # Use configured remote URL if provided, else neutral default
+        return remote_url or DEFAULT_IMAGE
+
+    def start_watcher(self, interval: float = 5.0):
+        """Poll the directory mtime and rescan when files are added, removed or renamed."""
+        if self._watcher is not None and self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name="image-manifest", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        self._stop.set()
+
+    def _watch(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                mtime = os.stat(self.directory).st_mtime_ns
+            except FileNotFoundError:
+                mtime = None
+            if mtime != self._dir_mtime:
+                self.scan()
+
+
+image_manifest = ImageManifest()
+image_manifest.scan()
@@ -0,0 +1,288 @@
+# Background image sync: one leader per host, pooled HTTP, conditional revalidation
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlsplit
+
+try:
+    import fcntl
+except Exception:  # No flock on Windows: every process acts as leader
+    fcntl = None
+
+from images import IMAGES_DIR, ALLOWED_EXTS, image_manifest
+
+log = logging.getLogger("myuni.imagesync")
+
+USER_AGENT = "MyUni/1.0 (+cache)"
+SYNC_WORKERS = int(os.getenv("IMAGE_SYNC_WORKERS", "6"))
+PER_HOST_LIMIT = int(os.getenv("IMAGE_SYNC_PER_HOST", "2"))
+# Background sync waits this long after startup so it doesn't compete with worker boot
+SYNC_DELAY = float(os.getenv("IMAGE_SYNC_DELAY", "10"))
+# A full pass runs at most once per host per interval (for the same catalog), however many workers boot
+SYNC_INTERVAL = int(os.getenv("IMAGE_SYNC_INTERVAL", "3600"))
+REFRESH_SECONDS = int(os.getenv("IMAGE_REFRESH_SECONDS", str(7 * 24 * 3600)))
+MAX_IMAGE_BYTES = int(os.getenv("IMAGE_MAX_BYTES", str(10 * 1024 * 1024)))
+TIMEOUT = 5
+STATE_PATH = Path(os.getenv("IMAGE_SYNC_STATE", "data/image-sync.json"))
+
+_EXT_BY_TYPE = (("svg", "svg"), ("png", "png"), ("webp", "webp"), ("jpeg", "jpg"))
+_LAST_RUN = "_last_run"  # sidecar key next to the per-slug entries; never a slug
+
+
+def default_sources(u) -> list:
+    sources = []
+    if u.image:
+        sources.append(u.image)
+    # Last-resort fast placeholder to ensure something shows if remotes fail
+    sources.append(f"https://picsum.photos/seed/{u.slug}/1200/800")
+    return sources
+
+
+def make_session(pool_size: int = SYNC_WORKERS):
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(total=2, connect=2, read=2, backoff_factor=0.5,
+                  status_forcelist=(429, 500, 502, 503, 504), allowed_methods=("GET",))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.headers["User-Agent"] = USER_AGENT
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class ImageSync:
+    """Downloads missing images and revalidates stale ones into `dest_dir`.
+
+    Validators (ETag / Last-Modified) and fetch times live in a sidecar JSON
+    file (`state_path`), so later runs send conditional requests and only touch
+    entries older than `refresh_seconds`, each against the URL it came from.
+    Images already on disk without a sidecar entry are adopted and never
+    refetched. The sidecar also records when the last complete pass finished
+    and over which records, so workers booting within `interval` seconds of it
+    skip the pass instead of rescanning the catalog. `sources(u)` and `session` are
+    injectable so the sync can be pointed at a local stand-in server.
+    """
+
+    def __init__(self, dest_dir: Path = IMAGES_DIR, sources=default_sources, session=None,
+                 workers: int = SYNC_WORKERS, per_host: int = PER_HOST_LIMIT,
+                 refresh_seconds: int = REFRESH_SECONDS, manifest=image_manifest,
+                 state_path: Path = STATE_PATH, interval: int = SYNC_INTERVAL):
+        self.dest_dir = Path(dest_dir)
+        self.sources = sources
+        self.session = session
+        self.workers = workers
+        self.per_host = per_host
+        self.refresh_seconds = refresh_seconds
+        self.interval = interval
+        self.manifest = manifest
+        self.sidecar_path = Path(state_path)
+        self.lock_path = self.sidecar_path.with_suffix(".lock")
+        self.state = {}
+        self.stats = {"downloaded": 0, "not_modified": 0, "failed": 0, "skipped": 0}
+        self._host_slots = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    # --- leader election -------------------------------------------------
+
+    def _acquire_leader(self):
+        self.dest_dir.mkdir(parents=True, exist_ok=True)
+        self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is None:
+            return fd
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return None
+        return fd
+
+    # --- sidecar ---------------------------------------------------------
+
+    def _load_state(self):
+        try:
+            with open(self.sidecar_path, "r", encoding="utf-8") as f:
+                self.state = json.load(f)
+        except Exception:
+            self.state = {}
+
+    def _save_state(self):
+        tmp = self.sidecar_path.with_suffix(".tmp")
+        with self._lock:
+            data = json.dumps(self.state, sort_keys=True)
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(data)
+        tmp.replace(self.sidecar_path)
+
+    @staticmethod
+    def _records_digest(records) -> str:
+        # A catalog reload with new or re-pointed records must not be skipped as "recent"
+        h = hashlib.blake2b(digest_size=12)
+        for u in records:
+            h.update(f"{u.slug}\x1f{u.image or ''}\x1e".encode("utf-8"))
+        return h.hexdigest()
+
+    def _ran_recently(self, digest: str, now: float) -> bool:
+        last = self.state.get(_LAST_RUN) or {}
+        return last.get("records") == digest and 0 <= now - last.get("at", 0) < self.interval
+
+    # --- fetching --------------------------------------------------------
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _host_slot(self, url: str):
+        host = urlsplit(url).netloc
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = threading.BoundedSemaphore(self.per_host)
+        return slot
+
+    def _needs_sync(self, slug: str, now: float) -> bool:
+        local = self.manifest.get(slug)
+        if local is None:
+            return True
+        entry = self.state.get(slug)
+        if entry is None:
+            # Image predates the sidecar (e.g. committed to the repo): adopt it.
+            # It has no source URL to revalidate against, so it is kept as is.
+            with self._lock:
+                self.state[slug] = entry = {"fetched_at": local.mtime, "file": local.url.rpartition("/")[2]}
+        if not entry.get("url"):
+            return False
+        return now - entry.get("fetched_at", 0) >= self.refresh_seconds
+
+    def _urls(self, u) -> list:
+        entry = self.state.get(u.slug) or {}
+        if entry.get("url") and self.manifest.get(u.slug) is not None:
+            # Refresh a file this sync downloaded from its own URL only, so a
+            # fallback source (the placeholder) never replaces an existing image
+            return [entry["url"]]
+        return self.sources(u)
+
+    def sync_one(self, u) -> bool:
+        slug = u.slug
+        if not slug or self._stop.is_set():
+            return False
+        if not self._needs_sync(slug, time.time()):
+            self._count("skipped")
+            return True
+        for url in self._urls(u):
+            if self._fetch(slug, url):
+                return True
+        self._count("failed")
+        return False
+
+    def _fetch(self, slug: str, url: str) -> bool:
+        prev = self.state.get(slug) or {}
+        headers = {}
+        # Only revalidate against the URL the stored validators belong to
+        if prev.get("url") == url and (self.dest_dir / prev.get("file", "")).is_file():
+            if prev.get("etag"):
+                headers["If-None-Match"] = prev["etag"]
+            if prev.get("last_modified"):
+                headers["If-Modified-Since"] = prev["last_modified"]
+        try:
+            with self._host_slot(url):
+                with self.session.get(url, headers=headers, timeout=TIMEOUT, stream=True, allow_redirects=True) as r:
+                    if r.status_code == 304:
+                        with self._lock:
+                            self.state[slug] = dict(prev, fetched_at=time.time())
+                        self._count("not_modified")
+                        return True
+                    if r.status_code != 200:
+                        return False
+                    ctype = r.headers.get("content-type", "").lower()
+                    ext = next((e for key, e in _EXT_BY_TYPE if key in ctype), "jpg")
+                    dest = self.dest_dir / f"{slug}.{ext}"
+                    if not self._stream_to(r, dest):
+                        return False
+                    etag, last_modified = r.headers.get("etag"), r.headers.get("last-modified")
+        except Exception as exc:  # network errors, timeouts, exhausted retries
+            log.debug("image fetch failed for %s from %s: %s", slug, url, exc)
+            return False
+        # A different extension replaces any older variant for this slug
+        for other in ALLOWED_EXTS:
+            if other != ext:
+                (self.dest_dir / f"{slug}.{other}").unlink(missing_ok=True)
+        with self._lock:
+            self.state[slug] = {"url": url, "file": dest.name, "etag": etag,
+                                "last_modified": last_modified, "fetched_at": time.time()}
+        self.manifest.record(dest, replace=True)
+        self._count("downloaded")
+        return True
+
+    @staticmethod
+    def _stream_to(r, dest: Path) -> bool:
+        tmp = dest.with_name(dest.name + ".part")
+        size = 0
+        try:
+            with open(tmp, "wb") as f:
+                for chunk in r.iter_content(chunk_size=64 * 1024):
+                    size += len(chunk)
+                    if size > MAX_IMAGE_BYTES:
+                        raise ValueError("image too large")
+                    f.write(chunk)
+            if size == 0:
+                raise ValueError("empty body")
+            tmp.replace(dest)
+            return True
+        except Exception:
+            tmp.unlink(missing_ok=True)
+            return False
+
+    # --- orchestration ---------------------------------------------------
+
+    def run(self, records) -> bool:
+        """Sync every record if this process wins the host-wide lock; returns whether it ran."""
+        lock_fd = self._acquire_leader()
+        if lock_fd is None:
+            log.info("image sync already running in another worker; skipping")
+            return False
+        try:
+            if self.session is None:
+                try:
+                    self.session = make_session(self.workers)
+                except ImportError:
+                    return False  # Skip caching if requests is unavailable
+            self._load_state()
+            digest = self._records_digest(records)
+            if self._ran_recently(digest, time.time()):
+                log.info("image sync ran on this host less than %ss ago; skipping", self.interval)
+                return False
+            self.manifest.scan()
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="imagesync") as ex:
+                list(ex.map(self.sync_one, records))
+            if not self._stop.is_set():  # an interrupted pass is picked up by the next worker
+                with self._lock:
+                    self.state[_LAST_RUN] = {"at": time.time(), "records": digest}
+            self._save_state()
+            log.info("image sync done: %s", self.stats)
+            return True
+        finally:
+            os.close(lock_fd)  # releases the flock
+
+    def start_background(self, records, delay: float = 0):
+        self._stop.clear()
+        t = threading.Thread(target=self._run_after, args=(list(records), delay), name="imagesync", daemon=True)
+        t.start()
+        return t
+
+    def _run_after(self, records, delay):
+        if delay and self._stop.wait(delay):
+            return
+        self.run(records)
+
+    def stop(self):
+        self._stop.set()
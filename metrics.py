@@ -0,0 +1,408 @@
+# Prometheus metrics summed across gunicorn workers through per-process files in METRICS_DIR
+import bisect
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from contextlib import ContextDecorator
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # No flock on Windows: exited processes' files are left in place
+    fcntl = None
+
+_shm = Path("/dev/shm")
+METRICS_DIR = Path(os.getenv("METRICS_DIR") or (_shm if _shm.is_dir() else Path(tempfile.gettempdir())) / "myuni-metrics")
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; request latency of cached pages is sub-millisecond, bcrypt is hundreds of ms
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+IO_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5)
+BCRYPT_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.0, 5.0)
+
+_HEADER = struct.Struct("<Q")  # bytes in use, header included
+_KEYLEN = struct.Struct("<I")
+_VALUE = struct.Struct("<d")
+_ARCHIVE = "archive"  # counters and histograms merged from exited processes' files
+
+
+class _ValueFile:
+    """Append-only key -> float64 table in a memory-mapped file, written by one process.
+
+    Entries are [key length][key][padding][value], 8-byte aligned. The header is
+    updated after an entry is complete, so readers in other processes only see
+    whole entries, and an 8-byte aligned double is never read half-written.
+    """
+
+    INITIAL_SIZE = 64 * 1024
+
+    def __init__(self, path: Path):
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        size = os.fstat(self._fd).st_size
+        if size < self.INITIAL_SIZE:
+            os.ftruncate(self._fd, self.INITIAL_SIZE)
+            size = self.INITIAL_SIZE
+        self._map = mmap.mmap(self._fd, size)
+        self._values = memoryview(self._map).cast("d")
+        self._used = _HEADER.unpack_from(self._map, 0)[0] or _HEADER.size
+        self.slots = {}  # key -> index of its value in _values
+        for key, offset in _entries(self._map, self._used):
+            self.slots[key] = offset // _VALUE.size
+            metric = _families.get(key.partition("\x1f")[0])
+            if metric is not None and metric.kind == "gauge":
+                self._values[offset // _VALUE.size] = 0.0  # left by an earlier process with this pid
+        _HEADER.pack_into(self._map, 0, self._used)
+
+    def _append(self, key: str) -> int:
+        raw = key.encode()
+        size = (_KEYLEN.size + len(raw) + 7) // 8 * 8 + _VALUE.size
+        if self._used + size > len(self._map):
+            new_size = max(len(self._map) * 2, self._used + size)
+            os.ftruncate(self._fd, new_size)
+            self._values.release()
+            self._map.close()
+            self._map = mmap.mmap(self._fd, new_size)
+            self._values = memoryview(self._map).cast("d")
+        _KEYLEN.pack_into(self._map, self._used, len(raw))
+        self._map[self._used + _KEYLEN.size:self._used + _KEYLEN.size + len(raw)] = raw
+        slot = (self._used + size) // _VALUE.size - 1
+        self._values[slot] = 0.0
+        self._used += size
+        _HEADER.pack_into(self._map, 0, self._used)
+        self.slots[key] = slot
+        return slot
+
+    def add(self, key: str, amount: float):
+        slot = self.slots.get(key)
+        if slot is None:
+            slot = self._append(key)
+        self._values[slot] += amount
+
+    def close(self):
+        self._values.release()
+        self._map.close()
+        os.close(self._fd)
+
+
+def _entries(buf, used: int):
+    pos = _HEADER.size
+    while pos < used:
+        (length,) = _KEYLEN.unpack_from(buf, pos)
+        key = bytes(buf[pos + _KEYLEN.size:pos + _KEYLEN.size + length]).decode()
+        size = (_KEYLEN.size + length + 7) // 8 * 8 + _VALUE.size
+        yield key, pos + size - _VALUE.size
+        pos += size
+
+
+def _file_values(data: bytes):
+    # (key, value) for every complete entry in a process file's bytes
+    if len(data) < _HEADER.size:
+        return
+    for key, offset in _entries(data, min(_HEADER.unpack_from(data, 0)[0], len(data))):
+        yield key, _VALUE.unpack_from(data, offset)[0]
+
+
+# One file per process, opened on first write. Writes take a process-local lock,
+# uncontended outside the bcrypt/threadpool threads.
+_lock = threading.Lock()
+_file = None
+
+
+def _add(*pairs):
+    global _file
+    with _lock:
+        if _file is None:
+            _file = _ValueFile(METRICS_DIR / f"{os.getpid()}.db")
+        for key, amount in pairs:
+            _file.add(key, amount)
+
+
+def _after_fork():
+    # A forked worker writes its own file; checked here rather than per write
+    global _file, _lock
+    _file = None
+    _lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+_families = {}  # name -> metric, in registration order
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        _families[name] = self
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            labels = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(self.labelnames, values))
+            child = self._children[values] = self._child(f"{self.name}\x1f{labels}\x1f")
+        return child
+
+    def _child(self, prefix: str):
+        return _Value(prefix)
+
+    # Unlabelled metrics: counter.inc() instead of counter.labels().inc()
+    def inc(self, amount: float = 1):
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1):
+        self.labels().dec(amount)
+
+    def samples(self, values: dict):
+        for labels, parts in sorted(values.items()):
+            yield f"{self.name}{{{labels}}}" if labels else self.name, parts[""]
+
+
+class _Value:
+    __slots__ = ("key",)
+
+    def __init__(self, key: str):
+        self.key = key
+
+    def inc(self, amount: float = 1):
+        _add((self.key, amount))
+
+    def dec(self, amount: float = 1):
+        _add((self.key, -amount))
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+
+class Gauge(_Metric):
+    """Summed over live processes only; a dead worker's values are dropped."""
+
+    kind = "gauge"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _child(self, prefix: str):
+        return _HistogramValue(prefix, self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def samples(self, values: dict):
+        bounds = [f"{b:g}" for b in self.buckets] + ["+Inf"]
+        for labels, parts in sorted(values.items()):
+            sep = "," if labels else ""
+            cumulative = 0.0
+            for i, bound in enumerate(bounds):
+                cumulative += parts.get(str(i), 0.0)
+                yield f'{self.name}_bucket{{{labels}{sep}le="{bound}"}}', cumulative
+            suffix = f"{{{labels}}}" if labels else ""
+            yield f"{self.name}_sum{suffix}", parts.get("sum", 0.0)
+            yield f"{self.name}_count{suffix}", parts.get("count", 0.0)
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "_bucket_keys", "_sum", "_count")
+
+    def __init__(self, prefix: str, buckets):
+        self.buckets = buckets
+        # Per-bucket (non-cumulative) counts; +Inf is the last index
+        self._bucket_keys = [f"{prefix}{i}" for i in range(len(buckets) + 1)]
+        self._sum = prefix + "sum"
+        self._count = prefix + "count"
+
+    def pairs(self, value: float):
+        i = bisect.bisect_left(self.buckets, value)
+        return (self._bucket_keys[i], 1), (self._sum, value), (self._count, 1)
+
+    def observe(self, value: float):
+        _add(*self.pairs(value))
+
+    def time(self):
+        return _Timer(self)
+
+
+class _Timer(ContextDecorator):
+    def __init__(self, child):
+        self.child = child
+
+    def _recreate_cm(self):
+        # Used as a decorator, each call gets its own start time
+        return _Timer(self.child)
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self._start)
+        return False
+
+
+def _alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _dir_lock(exclusive: bool):
+    # Scrapes read the directory under a shared flock; folding files into the
+    # archive takes it exclusively (without waiting), so no scrape sees a value twice
+    if fcntl is None:
+        return None
+    try:
+        fd = os.open(METRICS_DIR / f"{_ARCHIVE}.lock", os.O_RDWR | os.O_CREAT, 0o600)
+    except OSError:
+        return None
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB if exclusive else fcntl.LOCK_SH)
+    except OSError:
+        os.close(fd)
+        return None
+    return fd
+
+
+def collect() -> dict:
+    """metric name -> {label string -> {part -> value}}, summed over every process file and the archive."""
+    out = {name: {} for name in _families}
+    lock_fd = _dir_lock(exclusive=False)
+    try:
+        dead = _read_files(out)
+    finally:
+        if lock_fd is not None:
+            os.close(lock_fd)
+    if dead and fcntl is not None:
+        _archive(dead)
+    return out
+
+
+def _read_files(out: dict) -> list:
+    # Sums every file into `out`; returns the files of processes that have exited
+    try:
+        paths = list(METRICS_DIR.glob("*.db"))
+    except OSError:
+        paths = []
+    dead = []
+    for path in paths:
+        try:
+            pid = None if path.stem == _ARCHIVE else int(path.stem)
+            data = path.read_bytes()
+        except (ValueError, OSError):
+            continue
+        alive = pid is not None and _alive(pid)
+        if pid is not None and not alive:
+            dead.append(path)
+        for key, value in _file_values(data):
+            name, labels, part = key.split("\x1f")
+            metric = _families.get(name)
+            if metric is None or (metric.kind == "gauge" and not alive):
+                continue
+            parts = out[name].setdefault(labels, {})
+            parts[part] = parts.get(part, 0.0) + value
+    return dead
+
+
+def _archive(paths):
+    """Fold exited processes' counters and histograms into one file and delete theirs.
+
+    Without this every recycled worker leaves a file behind that each scrape
+    reads again. Gauges are dropped, as they only count live processes.
+    """
+    lock_fd = _dir_lock(exclusive=True)
+    if lock_fd is None:
+        return  # another scrape holds the directory; the next one retries
+    try:
+        archive = _ValueFile(METRICS_DIR / f"{_ARCHIVE}.db")
+        try:
+            for path in paths:
+                try:
+                    data = path.read_bytes()
+                except OSError:
+                    continue  # already folded in by another process
+                for key, value in _file_values(data):
+                    metric = _families.get(key.partition("\x1f")[0])
+                    if metric is not None and metric.kind != "gauge":
+                        archive.add(key, value)
+                path.unlink()
+        finally:
+            archive.close()
+    finally:
+        os.close(lock_fd)
+
+
+def render() -> str:
+    """Prometheus text exposition format (0.0.4)."""
+    lines = []
+    for name, values in collect().items():
+        metric = _families[name]
+        lines.append(f"# HELP {name} {metric.documentation}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        for sample, value in metric.samples(values):
+            lines.append(f"{sample} {int(value) if value.is_integer() else repr(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def clear():
+    """Remove every process file and the archive, e.g. when the gunicorn master starts."""
+    for path in METRICS_DIR.glob("*.db"):
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+
+# --- Application metrics ---
+
+http_requests = Counter("myuni_http_requests_total", "HTTP requests by route template and status.",
+                        ("method", "route", "status"))
+http_request_seconds = Histogram("myuni_http_request_duration_seconds", "Time to the end of the response body.",
+                                 ("method", "route"))
+http_in_flight = Gauge("myuni_http_requests_in_flight", "Requests currently being handled.")
+rate_limit_rejections = Counter("myuni_rate_limit_rejections_total", "Requests answered 429 by the rate limiter.",
+                                ("rule",))
+image_cache_lookups = Counter("myuni_image_cache_lookups_total",
+                              "University image resolutions by whether a local copy was found.", ("result",))
+page_cache_lookups = Counter("myuni_page_cache_lookups_total",
+                             "Rendered page/API response cache lookups by result.", ("result",))
+password_seconds = Histogram("myuni_password_seconds", "bcrypt hash/verify time on the password pool.",
+                             ("op",), buckets=BCRYPT_BUCKETS)
+password_rejections = Counter("myuni_password_rejections_total", "Hash/verify calls refused because the pool was full.")
+store_seconds = Histogram("myuni_store_seconds", "Session and user store operation time.",
+                          ("store", "op"), buckets=IO_BUCKETS)
+submission_records = Counter("myuni_submission_records_total",
+                             "/api/save records by outcome: written, dropped on a write error, or rejected (queue full).",
+                             ("result",))
+submission_batches = Counter("myuni_submission_batches_total", "Group-commit appends to the submissions file.")
+
+
+def request_finished(method: str, route: str, status: int, seconds: float):
+    # Counter, histogram and in-flight decrement in a single lock round
+    _add((http_requests.labels(method, route, str(status)).key, 1),
+         (http_in_flight.labels().key, -1),
+         *http_request_seconds.labels(method, route).pairs(seconds))
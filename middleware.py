@@ -0,0 +1,223 @@
+# Pure ASGI middlewares: no BaseHTTPMiddleware task/stream wrapping on the hot path
+import time
+
+from starlette.routing import Match
+
+import metrics
+from compression import COMPRESS_MIN_SIZE, StreamCompressor, compress, is_compressible, negotiate
+from ratelimit import RateLimiter, DEFAULT_RULES
+
+# CSP allows our domain, Bootstrap CDN, and HTTPS images
+CSP = (
+    "default-src 'self'; "
+    "img-src 'self' data: https:; "
+    "style-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net; "
+    "script-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net; "
+    "font-src 'self' data: https://cdn.jsdelivr.net; "
+    "object-src 'none'; frame-ancestors 'none'"
+)
+
+# Security headers (basic starter set), encoded once at import
+SECURITY_HEADERS = (
+    (b"x-content-type-options", b"nosniff"),
+    (b"x-frame-options", b"DENY"),
+    (b"referrer-policy", b"no-referrer-when-downgrade"),
+    (b"content-security-policy", CSP.encode("latin-1")),
+)
+
+
+class SecurityHeadersMiddleware:
+    def __init__(self, app, headers=SECURITY_HEADERS):
+        self.app = app
+        self.headers = tuple(headers)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                raw = list(message.get("headers", ()))
+                present = {k.lower() for k, _ in raw}
+                # Only set if not already present
+                raw.extend(h for h in self.headers if h[0] not in present)
+                message["headers"] = raw
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+
+class RateLimitMiddleware:
+    def __init__(self, app, limit: int = 60, window_seconds: int = 60, rules=DEFAULT_RULES, backend=None):
+        self.app = app
+        self.limiter = RateLimiter(limit, window_seconds, rules=rules, backend=backend)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        client = scope.get("client")
+        ip = client[0] if client else "anon"
+        decision = self.limiter.hit(scope["method"], scope["path"], ip)
+        limit_hdr = (b"x-ratelimit-limit", str(decision.limit).encode())
+        if not decision.allowed:
+            metrics.rate_limit_rejections.labels(decision.rule).inc()
+            body = b"Too Many Requests"
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    (b"content-type", b"text/plain; charset=utf-8"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(decision.retry_after).encode()),
+                    limit_hdr,
+                    (b"x-ratelimit-remaining", b"0"),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+        extra = (limit_hdr, (b"x-ratelimit-remaining", str(decision.remaining).encode()))
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", ()), *extra]
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+
+def _header(headers, name: bytes):
+    for k, v in headers:
+        if k.lower() == name:
+            return v.decode("latin-1")
+    return None
+
+
+def _encoded_headers(headers, encoding: str, length=None):
+    # Drop the identity length, weaken the ETag (the bytes differ) and add Vary
+    out, vary = [], None
+    for k, v in headers:
+        lk = k.lower()
+        if lk == b"content-length":
+            continue
+        if lk == b"etag" and not v.startswith(b"W/"):
+            v = b"W/" + v
+        if lk == b"vary":
+            vary = v
+            continue
+        out.append((k, v))
+    if vary is None:
+        vary = b"Accept-Encoding"
+    elif b"accept-encoding" not in vary.lower():
+        vary += b", Accept-Encoding"
+    out.append((b"vary", vary))
+    out.append((b"content-encoding", encoding.encode()))
+    if length is not None:
+        out.append((b"content-length", str(length).encode()))
+    return out
+
+
+class CompressionMiddleware:
+    """gzip/brotli for text responses, negotiated from Accept-Encoding.
+
+    Small bodies, non-text types (JPEG, WebP, ...) and responses that already carry
+    a Content-Encoding (cached page variants, precompressed assets) pass through.
+    Single-message bodies are compressed in one shot; streamed bodies chunk by chunk.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            return await self.app(scope, receive, send)
+        encoding = negotiate(_header(scope["headers"], b"accept-encoding") or "")
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        start = None
+        compressor = None  # None: undecided, False: pass through
+
+        async def send_compressed(message):
+            nonlocal start, compressor
+            if message["type"] == "http.response.start":
+                start = message  # held until the first body chunk decides
+                return
+            if compressor is False or start is None:
+                return await send(message)  # also extension messages sent before the start
+            body = message.get("body", b"")
+            more = message.get("more_body", False)
+            if compressor is None:
+                headers = start.get("headers", ())
+                if (message["type"] != "http.response.body"
+                        or start["status"] < 200 or start["status"] in (204, 206, 304)
+                        or _header(headers, b"content-encoding") is not None
+                        or not is_compressible(_header(headers, b"content-type") or "")
+                        or (not more and len(body) < self.minimum_size)):
+                    compressor = False
+                    await send(start)
+                    return await send(message)
+                if not more:
+                    compressor = False
+                    data = compress(body, encoding)
+                    start["headers"] = _encoded_headers(headers, encoding, len(data))
+                    await send(start)
+                    return await send({"type": "http.response.body", "body": data})
+                compressor = StreamCompressor(encoding)
+                start["headers"] = _encoded_headers(headers, encoding)
+                await send(start)
+            data = compressor.compress(body) if body else b""
+            if not more:
+                data += compressor.finish()
+            if data or not more:
+                await send({"type": "http.response.body", "body": data, "more_body": more})
+
+        await self.app(scope, receive, send_compressed)
+        if start is not None and compressor is None:
+            await send(start)  # response without a body message
+
+
+def _route_label(scope) -> str:
+    # Route template, never the raw path, so /university/<slug> stays one series
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    routes = getattr(getattr(scope.get("app"), "router", None), "routes", ())
+    endpoint = scope.get("endpoint")
+    if endpoint is not None:
+        # Mounts (static files) set the endpoint but no route
+        for route in routes:
+            if endpoint is getattr(route, "app", None) or endpoint is getattr(route, "endpoint", None):
+                return route.path
+        return "unmatched"
+    # Requests answered before routing (429, bad host)
+    for route in routes:
+        match, _ = route.matches(scope)
+        if match is Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """Request count, latency and in-flight gauge per route template (see metrics.py)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        metrics.http_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            metrics.request_finished(scope["method"], _route_label(scope), status, time.perf_counter() - start)
@@ -0,0 +1,97 @@
+# Rendered-page cache for catalog pages: LRU under a byte budget, strong ETags, 304s.
+# Bodies are stored with their gzip/brotli encodings so each page is compressed once.
+import hashlib
+import os
+import threading
+from collections import OrderedDict, namedtuple
+
+from starlette.responses import Response
+
+from compression import COMPRESS_MIN_SIZE, ENCODINGS, compress, negotiate
+from metrics import page_cache_lookups
+
+PAGE_CACHE_BYTES = int(os.getenv("PAGE_CACHE_BYTES", str(32 * 1024 * 1024)))
+PAGE_CACHE_MAX_AGE = int(os.getenv("PAGE_CACHE_MAX_AGE", "60"))
+
+# `encoded` maps content-coding -> compressed body (empty for small pages)
+CachedPage = namedtuple("CachedPage", "body etag media_type encoded")
+
+
+_page_hit = page_cache_lookups.labels("hit")
+_page_miss = page_cache_lookups.labels("miss")
+
+
+def etag_for(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match uses weak comparison, so W/"x" matches "x"
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def _entry_bytes(entry: CachedPage) -> int:
+    return len(entry.body) + sum(map(len, entry.encoded.values()))
+
+
+class PageCache:
+    def __init__(self, max_bytes: int = PAGE_CACHE_BYTES, max_age: int = PAGE_CACHE_MAX_AGE):
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        (_page_miss if entry is None else _page_hit).inc()
+        return entry
+
+    def put(self, key, body: bytes, media_type: str = "text/html; charset=utf-8", etag: str = None) -> CachedPage:
+        # `etag` lets callers use a validator they can compute without the body
+        encoded = {}
+        if len(body) >= COMPRESS_MIN_SIZE:
+            encoded = {enc: compress(body, enc, cached=True) for enc in ENCODINGS}
+        entry = CachedPage(body, etag or etag_for(body), media_type, encoded)
+        size = _entry_bytes(entry)
+        if size > self.max_bytes:
+            return entry  # too big to keep; still usable for this response
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= _entry_bytes(old)
+            self._entries[key] = entry
+            self.size += size
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= _entry_bytes(evicted)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def respond(self, request, entry: CachedPage) -> Response:
+        body, etag = entry.body, entry.etag
+        headers = {"Cache-Control": f"public, max-age={self.max_age}"}
+        if entry.encoded:
+            headers["Vary"] = "Accept-Encoding"
+            encoding = negotiate(request.headers.get("accept-encoding", ""), tuple(entry.encoded))
+            if encoding is not None:
+                # Each representation gets its own strong validator
+                body, etag = entry.encoded[encoding], f'{etag[:-1]}-{encoding}"'
+                headers["Content-Encoding"] = encoding
+        headers["ETag"] = etag
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        return Response(body, media_type=entry.media_type, headers=headers)
@@ -0,0 +1,113 @@
+# Password hashing on a bounded thread pool so bcrypt never blocks the event loop
+import asyncio
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import password_rejections, password_seconds
+
+_bcrypt = None  # module once imported; False when unavailable
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", "2"))
+# Hash/verify calls allowed to be running or queued before new ones are rejected
+PASSWORD_MAX_PENDING = int(os.getenv("PASSWORD_MAX_PENDING", "16"))
+
+
+def _get_bcrypt():
+    # Imported on first hash/verify: only login/signup need it, not worker boot
+    global _bcrypt
+    if _bcrypt is None:
+        try:
+            import bcrypt
+        except Exception:  # Fallback so the app still runs without bcrypt
+            bcrypt = False
+        _bcrypt = bcrypt
+    return _bcrypt or None
+
+
+class PasswordPoolBusy(Exception):
+    """Raised when the hashing pool is saturated; callers should answer 503."""
+
+
+def hash_password_sync(pw: str) -> str:
+    bcrypt = _get_bcrypt()
+    if bcrypt is not None:
+        return bcrypt.hashpw(pw.encode(), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode()
+    salt = secrets.token_hex(8)
+    h = hashlib.sha256((salt + pw).encode()).hexdigest()
+    return f"sha256${salt}${h}"
+
+
+def check_password_sync(pw: str, hashed: str) -> bool:
+    try:
+        if hashed.startswith("sha256$"):
+            _, salt, h = hashed.split("$")
+            return hmac.compare_digest(hashlib.sha256((salt + pw).encode()).hexdigest(), h)
+        bcrypt = _get_bcrypt()
+        if bcrypt is None:
+            return False
+        return bcrypt.checkpw(pw.encode(), hashed.encode())
+    except Exception:
+        return False
+
+
+class PasswordHasher:
+    """Runs hash/verify on a small executor with a hard cap on outstanding work."""
+
+    def __init__(self, workers: int = PASSWORD_WORKERS, max_pending: int = PASSWORD_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._pid = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # Created lazily (and again after a fork) so each worker owns its threads
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pwhash")
+            self._pid = os.getpid()
+            self._pending = 0
+        return self._executor
+
+    @staticmethod
+    def _timed(op, fn, *args):
+        # Measured inside the worker thread, so queueing time is not included
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            password_seconds.labels(op).observe(time.perf_counter() - start)
+
+    async def _submit(self, op, fn, *args):
+        with self._lock:
+            executor = self._get_executor()
+            if self._pending >= self.max_pending:
+                password_rejections.inc()
+                raise PasswordPoolBusy()
+            self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(executor, self._timed, op, fn, *args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    async def hash(self, pw: str) -> str:
+        return await self._submit("hash", hash_password_sync, pw)
+
+    async def verify(self, pw: str, hashed: str) -> bool:
+        return await self._submit("verify", check_password_sync, pw, hashed or "")
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+hasher = PasswordHasher()
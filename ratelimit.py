@@ -0,0 +1,151 @@
+# GCRA rate limiting with O(1) state per client and optional cross-worker sharing
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from pathlib import Path
+
+try:
+    import fcntl
+except Exception:  # Not available on Windows; the shared backend needs it
+    fcntl = None
+
+Decision = namedtuple("Decision", "allowed limit remaining retry_after rule")
+
+# (name, method or None for any, path prefix, limit, window seconds); first match wins
+DEFAULT_RULES = (
+    ("login", "POST", "/login", 10, 60),
+    ("signup", "POST", "/signup", 5, 60),
+    ("save", "POST", "/api/save", 20, 60),
+    # Typeahead fires per keystroke (10-20x page views); its own bucket keeps a fast
+    # typist from exhausting the site-wide default
+    ("suggest", "GET", "/api/suggest", 1200, 60),
+)
+
+
+class MemoryBackend:
+    """Per-process map of key -> theoretical arrival time, LRU-bounded."""
+
+    def __init__(self, max_keys: int = 50_000):
+        self.max_keys = max_keys
+        self._tat = OrderedDict()
+        self._lock = threading.Lock()
+
+    def update(self, key: str, now: float, interval: float, window: float):
+        with self._lock:
+            tat = self._tat.get(key, now)
+            allowed, new_tat = _gcra(tat, now, interval, window)
+            if allowed:
+                self._tat[key] = new_tat
+            if key in self._tat:
+                self._tat.move_to_end(key)
+            while len(self._tat) > self.max_keys:
+                self._tat.popitem(last=False)
+            return allowed, new_tat
+
+
+class SharedMemoryBackend:
+    """Fixed-size hash table in a memory-mapped file shared by every worker on the host.
+
+    Each slot holds (64-bit key hash, TAT). Collisions probe a few neighbours and
+    reuse the slot with the oldest TAT, so memory never grows and idle clients are
+    overwritten first. Updates are serialised with flock on the mapping's file.
+    """
+
+    SLOT = struct.Struct("<Qd")
+    PROBES = 8
+
+    def __init__(self, path: Path = None, slots: int = 65_536):
+        if fcntl is None:
+            raise RuntimeError("shared rate limiting needs fcntl")
+        shm = Path("/dev/shm")
+        default_dir = shm if shm.is_dir() else Path(tempfile.gettempdir())
+        self.path = Path(path or os.getenv("RATE_LIMIT_PATH", default_dir / "myuni-ratelimit"))
+        self.slots = slots
+        self._pid = None
+        self._lock = threading.Lock()
+        self._open()
+
+    def _open(self):
+        # Reopen after fork: flock is per open file description, not per process
+        size = self.slots * self.SLOT.size
+        if self._pid is not None:
+            self._map.close()
+            os.close(self._fd)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(fd).st_size < size:
+            os.ftruncate(fd, size)
+        self._fd = fd
+        self._map = mmap.mmap(fd, size)
+        self._pid = os.getpid()
+
+    def update(self, key: str, now: float, interval: float, window: float):
+        if self._pid != os.getpid():
+            self._open()
+        tag = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") | 1
+        base = tag % self.slots
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                slot, tat, free, oldest = None, now, None, None
+                for i in range(self.PROBES):
+                    idx = (base + i) % self.slots
+                    t, stored = self.SLOT.unpack_from(self._map, idx * self.SLOT.size)
+                    if t == tag:
+                        slot, tat = idx, stored
+                        break
+                    if free is None and (t == 0 or stored <= now):
+                        free = idx  # empty or idle: reusable without losing live state
+                    elif oldest is None or stored < oldest[1]:
+                        oldest = (idx, stored)
+                if slot is None:
+                    slot = free if free is not None else oldest[0]
+                allowed, new_tat = _gcra(tat, now, interval, window)
+                if allowed:
+                    self.SLOT.pack_into(self._map, slot * self.SLOT.size, tag, new_tat)
+                return allowed, new_tat
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+
+def _gcra(tat: float, now: float, interval: float, window: float):
+    # A request is allowed if, after paying its interval, the bucket is not over-full
+    new_tat = max(tat, now) + interval
+    return new_tat - now <= window, new_tat
+
+
+class RateLimiter:
+    def __init__(self, limit: int = 120, window_seconds: int = 60, rules=DEFAULT_RULES, backend=None):
+        self.default = ("default", None, "", limit, window_seconds)
+        self.rules = tuple(rules or ())
+        self.backend = backend or MemoryBackend()
+
+    def _rule(self, method: str, path: str):
+        for rule in self.rules:
+            name, rmethod, prefix, _, _ = rule
+            if (rmethod is None or rmethod == method) and path.startswith(prefix):
+                return rule
+        return self.default
+
+    def hit(self, method: str, path: str, client: str) -> Decision:
+        name, _, _, limit, window = self._rule(method, path)
+        interval = window / limit
+        now = time.time()
+        allowed, new_tat = self.backend.update(f"{name}:{client}", now, interval, window)
+        if allowed:
+            remaining = int((window - (new_tat - now)) // interval)
+            return Decision(True, limit, max(0, remaining), 0, name)
+        retry_after = new_tat - window - now
+        return Decision(False, limit, 0, max(1, int(retry_after + 0.999)), name)
+
+
+def make_backend():
+    # RATE_LIMIT_BACKEND=shared enforces limits per host instead of per worker
+    backend = os.getenv("RATE_LIMIT_BACKEND", "memory").strip().lower()
+    if backend == "shared" and fcntl is not None:
+        return SharedMemoryBackend()
+    return MemoryBackend()
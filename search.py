@@ -0,0 +1,218 @@
+# Full-text search over the university catalog (inverted index + BM25 ranking)
+import heapq
+import math
+import re
+from bisect import bisect_left
+from collections import Counter
+from itertools import compress, repeat
+from operator import add, mul, neg
+from urllib.parse import urlencode
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# Field weights: a hit in the name matters more than one in the requirements
+FIELD_WEIGHTS = (
+    ("name", 3.0),
+    ("programs", 2.0),
+    ("description", 1.0),
+    ("requirements", 0.5),
+)
+
+# BM25 tuning constants
+K1 = 1.2
+B = 0.75
+
+# Upper bound on how many index terms a single prefix may expand into
+MAX_PREFIX_EXPANSION = 64
+
+
+def tokenize(text) -> list:
+    if not text:
+        return []
+    if not isinstance(text, str):
+        text = " ".join(str(t) for t in text)
+    return _TOKEN_RE.findall(text.casefold())
+
+
+class SearchIndex:
+    """Inverted index with BM25 weights computed at build time.
+
+    A query intersects the posting lists rarest token first, then scores only the
+    documents left; `rank` orders those (or just the top n of them).
+    """
+
+    __slots__ = ("docs", "postings", "terms")
+
+    def __init__(self, records):
+        self.docs = tuple(records)
+        doc_tf = []
+        doc_len = []
+        for u in self.docs:
+            tf = {}
+            length = 0.0
+            for field, weight in FIELD_WEIGHTS:
+                for tok in tokenize(getattr(u, field)):
+                    tf[tok] = tf.get(tok, 0.0) + weight
+                    length += weight
+            doc_tf.append(tf)
+            doc_len.append(length)
+        avgdl = (sum(doc_len) / len(doc_len)) if doc_len else 0.0
+        n = len(self.docs)
+        df = Counter(tok for tf in doc_tf for tok in tf)
+        idf = {t: math.log(1.0 + (n - c + 0.5) / (c + 0.5)) for t, c in df.items()}
+        # term -> {doc id: the term's whole BM25 contribution}, so exact-word queries
+        # score with lookups and additions only
+        postings = {}
+        for doc_id, tf in enumerate(doc_tf):
+            norm = K1 * (1 - B + B * doc_len[doc_id] / (avgdl or 1.0))
+            for tok, freq in tf.items():
+                postings.setdefault(tok, {})[doc_id] = idf[tok] * freq * (K1 + 1) / (freq + norm)
+        self.postings = postings
+        self.terms = tuple(sorted(postings))
+
+    def _expand(self, prefix: str) -> list:
+        # Terms starting with prefix, found by bisecting the sorted vocabulary
+        out = []
+        i = bisect_left(self.terms, prefix)
+        while i < len(self.terms) and len(out) < MAX_PREFIX_EXPANSION:
+            term = self.terms[i]
+            if not term.startswith(prefix):
+                break
+            out.append(term)
+            i += 1
+        return out
+
+    def _plan(self, query: str):
+        """Per query token its [(weight, postings), ...] expansions, rarest token first; None if one matches nothing."""
+        plan = []
+        for tok in dict.fromkeys(tokenize(query)):
+            # Prefix completions count a little less than exact word matches
+            expansions = [(1.0 if t == tok else 0.8, self.postings[t]) for t in self._expand(tok)]
+            if not expansions:
+                return None
+            plan.append(expansions)
+        plan.sort(key=lambda expansions: sum(len(p) for _, p in expansions))
+        return plan or None
+
+    def match(self, query: str):
+        """(ids of the documents matching every token, scores(ids) -> their BM25 scores)."""
+        plan = self._plan(query)
+        if plan is None:
+            return set(), None
+        first, *rest = plan
+        ids = set().union(*(p for _, p in first))
+        for expansions in rest:
+            if not ids:
+                break
+            # Set operations against the posting dicts' keys stay in C
+            if len(expansions) == 1:
+                ids &= expansions[0][1].keys()
+            else:
+                ids &= set().union(*(p for _, p in expansions))
+        singles = [e[0] for e in plan if len(e) == 1]
+        multis = [e for e in plan if len(e) > 1]
+
+        def scores(doc_ids: list) -> list:
+            # Column-wise over all documents at once (map runs in C); a single-term
+            # token is in every matching posting, a prefix token takes its best expansion
+            total = None
+            for weight, p in singles:
+                col = map(p.__getitem__, doc_ids)
+                if weight != 1.0:
+                    col = map(mul, col, repeat(weight))
+                total = list(col) if total is None else list(map(add, total, col))
+            for expansions in multis:
+                col = map(max, *(map(mul, map(p.get, doc_ids, repeat(0.0)), repeat(weight)) for weight, p in expansions))
+                total = list(col) if total is None else list(map(add, total, col))
+            return total
+
+        return ids, scores
+
+    def rank(self, ids, scores, n: int = None) -> list:
+        """Records for `ids`, best first (ties in catalog order); only the top `n` if given."""
+        ids = list(ids)
+        values = scores(ids)
+        if n is not None and n < len(ids):
+            # Keep what scores at least the n-th best, then sort just those
+            if n <= 0:
+                return []
+            cut = heapq.nlargest(n, values)[-1]
+            keep = list(map(cut.__le__, values))
+            ids, values = list(compress(ids, keep)), list(compress(values, keep))
+        ordered = sorted(zip(values, map(neg, ids)), reverse=True)[:n]
+        return [self.docs[-d] for _, d in ordered]
+
+    def search(self, query: str, limit: int = None) -> list:
+        """Return records matching every query token, best match first."""
+        ids, score = self.match(query)
+        return self.rank(ids, score, limit) if ids else []
+
+
+class Suggester:
+    """Prefix completion over names, slugs and programs using bisect on sorted keys."""
+
+    __slots__ = ("_all", "_by_city")
+
+    # Cap on entries examined per lookup so cost stays flat for short prefixes
+    MAX_SCAN = 256
+
+    def __init__(self, records):
+        entries = []
+        programs = set()  # distinct (program, city): duplicates would fill the MAX_SCAN window
+        for u in records:
+            name, slug, city = u.name, u.slug, u.city
+            uni = ("university", name, slug, city)
+            # Every word start of the name is a key so "dubai" finds "University of Dubai"
+            words = tokenize(name)
+            for i in range(len(words)):
+                entries.append((" ".join(words[i:]), i, uni))
+            if slug:
+                entries.append((" ".join(tokenize(slug)), 1, uni))
+            programs.update((p, city) for p in u.programs)
+        by_city = {}
+        for e in entries:
+            by_city.setdefault(e[2][3].casefold(), []).append(e)
+        for p, city in programs:
+            by_city.setdefault(city.casefold(), []).append((p.casefold(), 0, ("program", p, "", city)))
+        # Unscoped lookups collapse programs across cities: one entry per program
+        entries += [(p.casefold(), 0, ("program", p, "", "")) for p in {p for p, _ in programs}]
+        order = lambda e: (e[0], e[1], e[2][1])  # noqa: E731
+        entries.sort(key=order)
+        self._all = self._pack(entries)
+        for v in by_city.values():
+            v.sort(key=order)
+        self._by_city = {k: self._pack(v) for k, v in by_city.items()}
+
+    @staticmethod
+    def _pack(entries):
+        return tuple(e[0] for e in entries), tuple((e[1], e[2]) for e in entries)
+
+    def suggest(self, prefix: str, city: str = None, limit: int = 8) -> list:
+        prefix = " ".join(tokenize(prefix)) if prefix else ""
+        if not prefix:
+            return []
+        if city:
+            keys, items = self._by_city.get(city.casefold(), ((), ()))
+        else:
+            keys, items = self._all
+        matches = {}
+        i = bisect_left(keys, prefix)
+        end = min(len(keys), i + self.MAX_SCAN)
+        while i < end and keys[i].startswith(prefix):
+            depth, item = items[i]
+            kind, label, slug, item_city = item
+            # Programs collapse across cities unless the lookup is city-scoped
+            ident = (kind, slug) if kind == "university" else (kind, label)
+            if ident not in matches or depth < matches[ident][0]:
+                matches[ident] = (depth, item)
+            i += 1
+        # Matches at the start of a name rank first, then universities before programs
+        ranked = sorted(matches.values(), key=lambda m: (m[0] > 0, m[1][0] != "university", m[1][1]))
+        out = []
+        for _, (kind, label, slug, item_city) in ranked[:limit]:
+            if kind == "university":
+                out.append({"type": kind, "label": label, "slug": slug, "city": item_city, "url": f"/university/{slug}"})
+            else:
+                params = {"city": city, "program": label} if city else {"program": label}
+                out.append({"type": kind, "label": label, "city": city or "", "url": "/universities?" + urlencode(params)})
+        return out
@@ -0,0 +1,191 @@
+# Login session storage: in-memory (LRU + TTL) or SQLite shared by all workers
+import json
+import os
+import secrets
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+import sqlite_store
+from metrics import store_seconds
+
+SESSION_TTL = int(os.getenv("SESSION_TTL", str(14 * 24 * 3600)))
+SWEEP_INTERVAL = int(os.getenv("SESSION_SWEEP_INTERVAL", "300"))
+# Seconds another worker may keep accepting a logged-out sid from its in-process cache
+# (SQLite backend); 0 disables the cache. State-changing requests always bypass it.
+SESSION_CACHE_TTL = float(os.getenv("SESSION_CACHE_TTL", "2"))
+LEGACY_SESSIONS_PATH = Path("data/sessions.json")
+
+
+def _timed(op: str):
+    # Database round trips only; in-process cache hits are not store I/O
+    return store_seconds.labels("sessions", op).time()
+
+
+class SessionStore(ABC):
+    """Maps opaque session ids to user ids; entries expire after `ttl` seconds."""
+
+    def __init__(self, ttl: int = SESSION_TTL, sweep_interval: int = SWEEP_INTERVAL):
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self._next_sweep = time.time() + sweep_interval
+
+    def create(self, user_id: str) -> str:
+        sid = secrets.token_urlsafe(24)
+        self._put(sid, user_id, time.time() + self.ttl)
+        self._maybe_sweep()
+        return sid
+
+    @abstractmethod
+    def get(self, sid: str, fresh: bool = False) -> Optional[str]:
+        """User id for `sid`; `fresh` skips any cache in front of the shared store."""
+
+    @abstractmethod
+    def delete(self, sid: str) -> None:
+        ...
+
+    @abstractmethod
+    def sweep(self) -> int:
+        """Drop expired sessions; returns how many were removed."""
+
+    @abstractmethod
+    def _put(self, sid: str, user_id: str, expires: float) -> None:
+        ...
+
+    def _maybe_sweep(self):
+        now = time.time()
+        if now >= self._next_sweep:
+            self._next_sweep = now + self.sweep_interval
+            self.sweep()
+
+
+class MemorySessionStore(SessionStore):
+    """Per-process store; bounded by `max_entries` with least-recently-used eviction."""
+
+    def __init__(self, max_entries: int = 100_000, **kw):
+        super().__init__(**kw)
+        self.max_entries = max_entries
+        self._data = OrderedDict()  # sid -> (user_id, expires)
+        self._lock = threading.Lock()
+
+    def _put(self, sid, user_id, expires):
+        with self._lock:
+            self._data[sid] = (user_id, expires)
+            self._data.move_to_end(sid)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def get(self, sid, fresh=False):
+        with self._lock:
+            entry = self._data.get(sid)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self._data[sid]
+                return None
+            self._data.move_to_end(sid)
+            return entry[0]
+
+    def delete(self, sid):
+        with self._lock:
+            self._data.pop(sid, None)
+
+    def sweep(self):
+        now = time.time()
+        with self._lock:
+            expired = [sid for sid, (_, exp) in self._data.items() if exp <= now]
+            for sid in expired:
+                del self._data[sid]
+        return len(expired)
+
+
+class SQLiteSessionStore(SessionStore):
+    """Sessions in a local SQLite file so every gunicorn worker sees the same logins.
+
+    Recently validated sessions are remembered in-process for `cache_ttl` seconds so
+    most page renders never touch the database. A logout reaches other workers only
+    after that, so it is kept short, and `get(sid, fresh=True)` skips the cache.
+    """
+
+    def __init__(self, path: Path = None, cache_ttl: float = SESSION_CACHE_TTL, **kw):
+        super().__init__(**kw)
+        self.path = Path(path or sqlite_store.DB_PATH)
+        self._cache = MemorySessionStore(max_entries=10_000, ttl=cache_ttl, sweep_interval=max(cache_ttl, 1))
+        self.cache_ttl = cache_ttl
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " sid TEXT PRIMARY KEY, user_id TEXT NOT NULL, expires REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS sessions_expires ON sessions(expires)")
+        self._migrate_legacy()
+
+    def _conn(self):
+        return sqlite_store.connect(self.path)
+
+    def _migrate_legacy(self):
+        # One-shot import of the old data/sessions.json (unexpired entries only)
+        if not LEGACY_SESSIONS_PATH.exists():
+            return
+        try:
+            with open(LEGACY_SESSIONS_PATH, "r", encoding="utf-8") as f:
+                legacy = json.load(f)
+        except Exception:
+            return
+        now = time.time()
+        rows = []
+        for sid, sess in (legacy or {}).items():
+            expires = float(sess.get("ts", 0)) + self.ttl
+            if sess.get("user_id") and expires > now:
+                rows.append((sid, sess["user_id"], expires))
+        with sqlite_store.transaction(self._conn()) as conn:
+            conn.executemany("INSERT OR IGNORE INTO sessions(sid, user_id, expires) VALUES (?, ?, ?)", rows)
+        try:
+            LEGACY_SESSIONS_PATH.replace(LEGACY_SESSIONS_PATH.with_suffix(".json.migrated"))
+        except OSError:
+            pass  # another worker already moved it
+
+    @_timed("put")
+    def _put(self, sid, user_id, expires):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO sessions(sid, user_id, expires) VALUES (?, ?, ?)",
+            (sid, user_id, expires),
+        )
+
+    def get(self, sid, fresh=False):
+        uid = None if fresh else self._cache.get(sid)
+        if uid is not None:
+            return uid
+        with _timed("get"):
+            row = self._conn().execute(
+                "SELECT user_id FROM sessions WHERE sid = ? AND expires > ?", (sid, time.time())
+            ).fetchone()
+        self._maybe_sweep()
+        if not row:
+            self._cache.delete(sid)
+            return None
+        if self.cache_ttl > 0:
+            self._cache._put(sid, row[0], time.time() + self.cache_ttl)
+        return row[0]
+
+    @_timed("delete")
+    def delete(self, sid):
+        self._cache.delete(sid)
+        self._conn().execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+
+    @_timed("sweep")
+    def sweep(self):
+        self._cache.sweep()
+        cur = self._conn().execute("DELETE FROM sessions WHERE expires <= ?", (time.time(),))
+        return cur.rowcount
+
+
+def make_session_store() -> SessionStore:
+    # SESSION_BACKEND=memory is fine for a single worker; sqlite is shared across workers
+    backend = os.getenv("SESSION_BACKEND", "sqlite").strip().lower()
+    if backend == "memory":
+        return MemorySessionStore()
+    return SQLiteSessionStore()
@@ -0,0 +1,50 @@
+# Shared SQLite plumbing for the account/session stores (WAL, one connection per thread)
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+DB_PATH = Path(os.getenv("MYUNI_DB", "data/myuni.db"))
+
+_local = threading.local()
+
+
+def connect(path: Path = None) -> sqlite3.Connection:
+    path = Path(path or DB_PATH)
+    conns = getattr(_local, "conns", None)
+    # Connections must not cross a fork: reopen when the pid changes
+    if conns is None or getattr(_local, "pid", None) != os.getpid():
+        conns = _local.conns = {}
+        _local.pid = os.getpid()
+    key = str(path)
+    conn = conns.get(key)
+    if conn is None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(key, timeout=5.0, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        conns[key] = conn
+    return conn
+
+
+def close_all():
+    """Close this thread's connections, e.g. in a preloading master before it forks workers."""
+    for conn in (getattr(_local, "conns", None) or {}).values():
+        conn.close()
+    _local.conns = None
+
+
+class transaction:
+    """`with transaction(conn):` runs the block inside BEGIN IMMEDIATE / COMMIT."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
@@ -2,6 +2,22 @@
 (function () {
   const storeKey = 'myuni:favorites';
   const cityKey = 'myuni:city';
+  const anonKey = 'myuni:anonymous';
+  // Sync state is per account (myuni_account cookie, set at login), so a second
+  // account on this browser never inherits the first one's version or queue
+  const account = (document.cookie.match(/(?:^|;\s*)myuni_account=([^;]+)/) || [])[1] || '';
+  const ownerKey = 'myuni:favorites-account';
+  const versionKey = `myuni:favorites-version:${account}`;
+  const pendingKey = `myuni:favorites-pending:${account}`;
+  // Keys from before sync state was per account
+  localStorage.removeItem('myuni:favorites-version');
+  localStorage.removeItem('myuni:favorites-pending');
+  const owner = localStorage.getItem(ownerKey);
+  if (owner && owner !== account) {
+    // The list mirrors an account that logged out (or another one logged in): drop it
+    [storeKey, ownerKey, `myuni:favorites-version:${owner}`, `myuni:favorites-pending:${owner}`]
+      .forEach(k => localStorage.removeItem(k));
+  }
 
   function getFavs() {
     try { return JSON.parse(localStorage.getItem(storeKey) || '[]'); } catch { return []; }
@@ -12,9 +28,84 @@
   }
   function toggleFav(slug) {
     const list = new Set(getFavs());
-    if (list.has(slug)) list.delete(slug); else list.add(slug);
+    const added = !list.has(slug);
+    if (added) list.add(slug); else list.delete(slug);
+    setFavs(Array.from(list));
+    updateCardButtons();
+    queueChange(slug, added);
+  }
+
+  // Account sync: toggles are queued as add/remove deltas and sent in the background
+  // (PATCH /api/favorites) against the last favorites version this browser saw.
+  function getPending() {
+    try { return JSON.parse(localStorage.getItem(pendingKey) || '{}'); } catch { return {}; }
+  }
+  function setPending(pending) {
+    localStorage.setItem(pendingKey, JSON.stringify(pending));
+  }
+  function queueChange(slug, added) {
+    if (!account) return;  // anonymous: the local list is merged into the account at login
+    const pending = getPending();
+    pending[slug] = added;
+    setPending(pending);
+    scheduleSync();
+  }
+  let syncTimer = null;
+  let syncing = null;
+  function scheduleSync(delay = 300) {
+    if (!account || sessionStorage.getItem(anonKey)) return;  // not logged in (or 401 earlier in this tab)
+    clearTimeout(syncTimer);
+    syncTimer = setTimeout(syncFavorites, delay);
+  }
+  function applyServer(data, pending) {
+    // Server state (full list or delta), then the local changes it has not confirmed yet
+    const list = new Set(data.favorites || getFavs());
+    (data.added || []).forEach(s => list.add(s));
+    (data.removed || []).forEach(s => list.delete(s));
+    Object.entries(pending).forEach(([s, added]) => { if (added) list.add(s); else list.delete(s); });
+    // Adds the server refused because the account's list is full
+    (data.rejected || []).forEach(s => list.delete(s));
+    localStorage.setItem(versionKey, String(data.version));
+    localStorage.setItem(ownerKey, account);
     setFavs(Array.from(list));
     updateCardButtons();
+    document.dispatchEvent(new CustomEvent('myuni:favorites', { detail: data }));
+  }
+  async function pushChanges() {
+    const sent = getPending();
+    const stored = localStorage.getItem(versionKey);
+    const body = { add: [], remove: [] };
+    Object.entries(sent).forEach(([s, added]) => (added ? body.add : body.remove).push(s));
+    if (stored !== null) {
+      body.version = Number(stored);
+    } else {
+      // First sync from this browser: merge its favorites into the account
+      getFavs().forEach(s => { if (!(s in sent)) body.add.push(s); });
+    }
+    const res = await fetch('/api/favorites', {
+      method: 'PATCH', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify(body)
+    });
+    if (res.status === 401) { sessionStorage.setItem(anonKey, '1'); return false; }
+    if (!res.ok && res.status !== 409) return false;  // pending changes are retried later
+    const data = await res.json();
+    const pending = getPending();
+    if (res.ok) {
+      // Applied: forget them, unless toggled again while the request was in flight
+      Object.keys(sent).forEach(s => { if (pending[s] === sent[s]) delete pending[s]; });
+      setPending(pending);
+    }
+    applyServer(data, pending);
+    if (data.rejected && data.rejected.length) {
+      alert(`Your favorites list is full: ${data.rejected.length} university(s) could not be saved. Remove some to add more.`);
+    }
+    // 409: another device changed the same slugs. We are rebased on its changes now,
+    // and the newer toggles from this browser are sent again on top of them.
+    if (res.status === 409 || Object.keys(pending).length) scheduleSync();
+    return true;
+  }
+  function syncFavorites() {
+    if (!syncing) syncing = pushChanges().catch(() => false).finally(() => { syncing = null; });
+    return syncing;
   }
   function getCity() {
     return localStorage.getItem(cityKey) || '';
@@ -37,6 +128,18 @@
     },
     toggleFavorite: toggleFav,
     getFavorites: getFavs,
+    // Called on pages that know the user is logged in (clears the anonymous flag)
+    syncFavorites: function(mergeLocal) {
+      if (!account) return Promise.resolve(false);
+      sessionStorage.removeItem(anonKey);
+      if (mergeLocal) {
+        const pending = getPending();
+        getFavs().forEach(s => { if (!(s in pending)) pending[s] = true; });
+        setPending(pending);
+      }
+      clearTimeout(syncTimer);
+      return syncFavorites();
+    },
     saveList: async function(name, email, note) {
       const payload = { name, email, note, city: getCity(), favorites: getFavs() };
       const res = await fetch('/api/save', {
@@ -66,12 +169,64 @@
     countEls.forEach(el => el.textContent = n);
   }
 
+  // Typeahead for search inputs marked with data-suggest (backed by /api/suggest)
+  function initSuggest(input) {
+    const menu = document.createElement('div');
+    menu.className = 'list-group position-absolute w-100 shadow-sm d-none';
+    menu.style.zIndex = 1000;
+    input.insertAdjacentElement('afterend', menu);
+    let timer = null;
+    let inflight = null;
+
+    function hide() { menu.classList.add('d-none'); menu.innerHTML = ''; }
+    function render(items) {
+      menu.innerHTML = '';
+      items.forEach(it => {
+        const a = document.createElement('a');
+        a.className = 'list-group-item list-group-item-action d-flex justify-content-between';
+        a.href = it.url;
+        a.textContent = it.label;
+        const meta = document.createElement('small');
+        meta.className = 'text-muted ms-2';
+        meta.textContent = it.type === 'program' ? 'Program' : it.city;
+        a.appendChild(meta);
+        menu.appendChild(a);
+      });
+      menu.classList.toggle('d-none', items.length === 0);
+    }
+    async function fetchSuggestions(prefix) {
+      if (inflight) inflight.abort();
+      inflight = new AbortController();
+      const params = new URLSearchParams({ prefix });
+      const city = input.getAttribute('data-city');
+      if (city) params.set('city', city);
+      try {
+        const res = await fetch(`/api/suggest?${params}`, { signal: inflight.signal });
+        if (!res.ok) return hide();
+        const data = await res.json();
+        render(data.suggestions || []);
+      } catch {}
+    }
+
+    input.addEventListener('input', () => {
+      clearTimeout(timer);
+      const prefix = input.value.trim();
+      if (!prefix) { if (inflight) inflight.abort(); return hide(); }
+      timer = setTimeout(() => fetchSuggestions(prefix), 120);
+    });
+    input.addEventListener('keydown', e => { if (e.key === 'Escape') hide(); });
+    input.addEventListener('blur', () => setTimeout(hide, 150));
+  }
+
   document.addEventListener('DOMContentLoaded', () => {
+    document.querySelectorAll('input[data-suggest]').forEach(initSuggest);
     // Initialize city badge if present
     const c = getCity();
     if (c) setCity(c);
     renderFavBadges();
     updateCardButtons();
+    // Retry changes a previous page could not send
+    if (Object.keys(getPending()).length) scheduleSync();
     // Reveal on scroll
     try {
       const els = document.querySelectorAll('.reveal');
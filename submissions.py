@@ -0,0 +1,140 @@
+# Group-commit writer for /api/save submissions (JSONL, multi-worker safe, rotated by size)
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+
+try:
+    import fcntl
+except Exception:  # Windows: appends are still atomic enough for a single worker
+    fcntl = None
+
+from metrics import submission_batches, submission_records
+
+log = logging.getLogger("myuni.submissions")
+
+SUBMISSIONS_PATH = Path(os.getenv("SUBMISSIONS_PATH", "data/submissions.jsonl"))
+BATCH_SIZE = int(os.getenv("SUBMISSIONS_BATCH_SIZE", "256"))
+FLUSH_INTERVAL = float(os.getenv("SUBMISSIONS_FLUSH_INTERVAL", "0.2"))
+MAX_FILE_BYTES = int(os.getenv("SUBMISSIONS_MAX_BYTES", str(64 * 1024 * 1024)))
+
+_STOP = object()
+
+
+class SubmissionSink:
+    """Queue records in memory and let one background thread append them in batches.
+
+    Each batch is a single write + fsync under an exclusive flock, so lines from
+    different gunicorn workers never interleave. When the file grows past
+    `max_bytes` it is renamed to `<name>-<timestamp>.jsonl` before the next write.
+    """
+
+    def __init__(self, path: Path = SUBMISSIONS_PATH, batch_size: int = BATCH_SIZE,
+                 flush_interval: float = FLUSH_INTERVAL, max_bytes: int = MAX_FILE_BYTES,
+                 max_queue: int = 10_000):
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.max_queue = max_queue
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        # Started lazily, and again after a fork, so each worker owns its flusher
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self.max_queue)
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="submissions-flush", daemon=True)
+            self._thread.start()
+
+    def submit(self, record: dict) -> bool:
+        """Enqueue one record; returns False if the queue is full."""
+        self._ensure_started()
+        record = dict(record)
+        record["ts"] = int(time.time())
+        try:
+            self._queue.put_nowait(json.dumps(record, ensure_ascii=False) + "\n")
+            return True
+        except queue.Full:
+            submission_records.labels("rejected").inc()
+            return False
+
+    def close(self, timeout: float = 5.0):
+        """Flush everything queued so far and stop the flusher."""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        q = self._queue
+        stopping = False
+        while not stopping:
+            item = q.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = q.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            try:
+                self._write(batch)
+            except OSError:
+                # Disk trouble must not kill the flusher; the batch is lost, so say so
+                log.exception("dropped %d submissions: could not append to %s", len(batch), self.path)
+                submission_records.labels("dropped").inc(len(batch))
+
+    def _open_locked(self):
+        # Lock the file currently at self.path; retry if it was rotated while we waited
+        while True:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            if fcntl is None:
+                return fd
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                if os.path.samestat(os.fstat(fd), os.stat(self.path)):
+                    return fd
+            except FileNotFoundError:
+                pass
+            os.close(fd)
+
+    def _write(self, lines):
+        data = "".join(lines).encode("utf-8")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = self._open_locked()
+        try:
+            size = os.fstat(fd).st_size
+            if self.max_bytes and size and size + len(data) > self.max_bytes:
+                stamp = time.strftime("%Y%m%d-%H%M%S") + f"-{time.time_ns() % 10**9:09d}"
+                os.replace(self.path, self.path.with_name(f"{self.path.stem}-{stamp}{self.path.suffix}"))
+                os.close(fd)
+                fd = self._open_locked()
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+            os.fsync(fd)
+            submission_records.labels("written").inc(len(lines))
+            submission_batches.inc()
+        finally:
+            os.close(fd)  # closing releases the flock
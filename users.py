@@ -0,0 +1,334 @@
+# User accounts: repository interface with a transactional SQLite backend
+import json
+import os
+import secrets
+import sqlite3
+from abc import ABC, abstractmethod
+from collections import namedtuple
+from pathlib import Path
+from typing import List, Optional
+
+import sqlite_store
+from metrics import store_seconds
+
+USERS_PATH = Path("data/users.json")
+# Favorite changes kept per user for delta syncs; older client versions get the full list
+FAVORITES_LOG_VERSIONS = int(os.getenv("FAVORITES_LOG_VERSIONS", "200"))
+MAX_FAVORITES = 200
+
+# Result of a favorites update. `favorites` is the full list when the client's base
+# version is unknown or too old; otherwise `added`/`removed` are the net changes
+# since that version (other devices' and this request's). With `conflicts`, nothing
+# was applied: another device changed those slugs the other way since the base.
+# `rejected` are requested adds left out because the list already had MAX_FAVORITES.
+FavoritesUpdate = namedtuple("FavoritesUpdate", "version favorites added removed conflicts rejected")
+
+
+def _timed(op: str):
+    return store_seconds.labels("users", op).time()
+
+
+def _normalize_email(email: str) -> str:
+    return (email or "").strip().lower()
+
+
+def _net(changes):
+    # Last change per slug wins; [(slug, added), ...] -> (added, removed)
+    last = {}
+    for slug, added in changes:
+        last.pop(slug, None)
+        last[slug] = added
+    return [s for s, a in last.items() if a], [s for s, a in last.items() if not a]
+
+
+def _plan_favorites(current, version, base_version, history, add, remove, limit=MAX_FAVORITES):
+    """Apply add/remove to `current`; returns (new list, changes, FavoritesUpdate).
+
+    `history` is [(slug, added), ...] since `base_version`, oldest first, or None
+    when unknown (no base given, or the change log no longer reaches back to it).
+    """
+    if history is not None:
+        last = dict(history)
+        conflicts = [s for s in add if last.get(s) is False] + [s for s in remove if last.get(s) is True]
+        if conflicts:
+            return current, [], FavoritesUpdate(version, None, *_net(history), conflicts, [])
+    favorites = list(current)
+    present = set(favorites)
+    changes = []
+    rejected = []
+    # Removals first, so a request that swaps favorites at the limit still fits
+    for slug in remove:
+        if slug in present:
+            present.discard(slug)
+            changes.append((slug, False))
+    for slug in add:
+        if slug in present:
+            continue
+        if len(present) >= limit:
+            rejected.append(slug)
+            continue
+        present.add(slug)
+        favorites.append(slug)
+        changes.append((slug, True))
+    if len(present) != len(favorites):
+        favorites = [s for s in favorites if s in present]
+    version = version + 1 if changes else version
+    if history is None:
+        return favorites, changes, FavoritesUpdate(version, favorites, [], [], [], rejected)
+    return favorites, changes, FavoritesUpdate(version, None, *_net(history + changes), [], rejected)
+
+
+class UserRepository(ABC):
+    """Users are plain dicts: id, name, email, password (hash) and favorites."""
+
+    @abstractmethod
+    def get_by_id(self, user_id: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    def get_by_email(self, email: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    def create(self, name: str, email: str, password_hash: str) -> Optional[dict]:
+        """Insert a new user; returns None if the email is already registered."""
+
+    @abstractmethod
+    def set_favorites(self, user_id: str, favorites: List[str]) -> bool:
+        ...
+
+    @abstractmethod
+    def update_favorites(self, user_id: str, add=(), remove=(), base_version: int = None) -> Optional[FavoritesUpdate]:
+        """Add/remove slugs on top of the client's `base_version` (None: no conflict check).
+
+        Bumps the user's favorites version when anything changed; None if no such user.
+        """
+
+    def favorites_since(self, user_id: str, base_version: int) -> Optional[FavoritesUpdate]:
+        """What changed since `base_version`, without writing; None if no such user."""
+        return self.update_favorites(user_id, base_version=base_version)
+
+
+class SQLiteUserRepository(UserRepository):
+    """Indexed lookups by id/email and single-row updates; safe across workers (WAL)."""
+
+    def __init__(self, path: Path = None):
+        self.path = Path(path or sqlite_store.DB_PATH)
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS users ("
+            " id TEXT PRIMARY KEY, name TEXT NOT NULL, email TEXT NOT NULL UNIQUE,"
+            " password TEXT NOT NULL, favorites TEXT NOT NULL DEFAULT '[]',"
+            " favorites_version INTEGER NOT NULL DEFAULT 0)"
+        )
+        columns = {row[1] for row in self._conn().execute("PRAGMA table_info(users)")}
+        if "favorites_version" not in columns:
+            try:
+                self._conn().execute("ALTER TABLE users ADD COLUMN favorites_version INTEGER NOT NULL DEFAULT 0")
+            except sqlite3.OperationalError:
+                pass  # another worker added it first
+        # One row per slug changed by each favorites version, for delta syncs
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS favorite_changes ("
+            " user_id TEXT NOT NULL, version INTEGER NOT NULL, slug TEXT NOT NULL, added INTEGER NOT NULL,"
+            " PRIMARY KEY (user_id, version, slug))"
+        )
+        self._migrate_legacy()
+
+    def _conn(self):
+        return sqlite_store.connect(self.path)
+
+    def _migrate_legacy(self):
+        # One-shot import of data/users.json; duplicates by id/email are skipped
+        if not USERS_PATH.exists():
+            return
+        try:
+            with open(USERS_PATH, "r", encoding="utf-8") as f:
+                legacy = json.load(f)
+        except Exception:
+            return
+        rows = [
+            (u["id"], u.get("name", ""), _normalize_email(u.get("email")), u.get("password", ""),
+             json.dumps(u.get("favorites") or []))
+            for u in (legacy or []) if u.get("id") and u.get("email")
+        ]
+        with sqlite_store.transaction(self._conn()) as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO users(id, name, email, password, favorites) VALUES (?, ?, ?, ?, ?)", rows
+            )
+        try:
+            USERS_PATH.replace(USERS_PATH.with_suffix(".json.migrated"))
+        except OSError:
+            pass  # another worker already moved it
+
+    @staticmethod
+    def _row(row) -> Optional[dict]:
+        if not row:
+            return None
+        return {"id": row[0], "name": row[1], "email": row[2], "password": row[3], "favorites": json.loads(row[4]),
+                "favorites_version": row[5]}
+
+    @_timed("get_by_id")
+    def get_by_id(self, user_id):
+        return self._row(self._conn().execute(
+            "SELECT id, name, email, password, favorites, favorites_version FROM users WHERE id = ?", (user_id,)
+        ).fetchone())
+
+    @_timed("get_by_email")
+    def get_by_email(self, email):
+        return self._row(self._conn().execute(
+            "SELECT id, name, email, password, favorites, favorites_version FROM users WHERE email = ?",
+            (_normalize_email(email),)
+        ).fetchone())
+
+    @_timed("create")
+    def create(self, name, email, password_hash):
+        user = {"id": secrets.token_hex(8), "name": name.strip(), "email": _normalize_email(email),
+                "password": password_hash, "favorites": [], "favorites_version": 0}
+        try:
+            self._conn().execute(
+                "INSERT INTO users(id, name, email, password, favorites) VALUES (?, ?, ?, ?, '[]')",
+                (user["id"], user["name"], user["email"], user["password"]),
+            )
+        except sqlite3.IntegrityError:
+            return None
+        return user
+
+    @_timed("set_favorites")
+    def set_favorites(self, user_id, favorites):
+        # Full replace, recorded as a delta so other devices can still sync incrementally
+        with sqlite_store.transaction(self._conn()) as conn:
+            row = conn.execute("SELECT favorites FROM users WHERE id = ?", (user_id,)).fetchone()
+            if not row:
+                return False
+            current = json.loads(row[0])
+            have, wanted = set(current), set(favorites)
+            self._update_favorites(conn, user_id, [s for s in favorites if s not in have],
+                                   [s for s in current if s not in wanted], None)
+        return True
+
+    @_timed("update_favorites")
+    def update_favorites(self, user_id, add=(), remove=(), base_version=None):
+        with sqlite_store.transaction(self._conn()) as conn:
+            return self._update_favorites(conn, user_id, add, remove, base_version)
+
+    @_timed("favorites_since")
+    def favorites_since(self, user_id, base_version):
+        # Plain autocommit reads: no write lock, so syncs that only poll never wait on writers
+        conn = self._conn()
+        row = conn.execute("SELECT favorites, favorites_version FROM users WHERE id = ?", (user_id,)).fetchone()
+        if not row:
+            return None
+        current, version = json.loads(row[0]), row[1]
+        history = None
+        if version - FAVORITES_LOG_VERSIONS <= base_version <= version:
+            rows = conn.execute(
+                "SELECT version, slug, added FROM favorite_changes"
+                " WHERE user_id = ? AND version > ? AND version <= ? ORDER BY version",
+                (user_id, base_version, version),
+            ).fetchall()
+            # Every version logs at least one row; a gap means a writer pruned the log in between
+            if len({r[0] for r in rows}) == version - base_version:
+                history = [(slug, bool(added)) for _, slug, added in rows]
+        return _plan_favorites(current, version, base_version, history, (), ())[2]
+
+    def _update_favorites(self, conn, user_id, add, remove, base_version):
+        row = conn.execute("SELECT favorites, favorites_version FROM users WHERE id = ?", (user_id,)).fetchone()
+        if not row:
+            return None
+        current, version = json.loads(row[0]), row[1]
+        history = None
+        # The log keeps the last FAVORITES_LOG_VERSIONS versions; older bases get the full list
+        if base_version is not None and version - FAVORITES_LOG_VERSIONS <= base_version <= version:
+            history = [(slug, bool(added)) for slug, added in conn.execute(
+                "SELECT slug, added FROM favorite_changes WHERE user_id = ? AND version > ? ORDER BY version",
+                (user_id, base_version),
+            )]
+        favorites, changes, update = _plan_favorites(current, version, base_version, history, add, remove)
+        if changes:
+            conn.execute("UPDATE users SET favorites = ?, favorites_version = ? WHERE id = ?",
+                         (json.dumps(favorites), update.version, user_id))
+            conn.executemany(
+                "INSERT OR REPLACE INTO favorite_changes(user_id, version, slug, added) VALUES (?, ?, ?, ?)",
+                [(user_id, update.version, slug, int(added)) for slug, added in changes],
+            )
+            conn.execute("DELETE FROM favorite_changes WHERE user_id = ? AND version <= ?",
+                         (user_id, update.version - FAVORITES_LOG_VERSIONS))
+        return update
+
+
+class JsonUserRepository(UserRepository):
+    """Legacy whole-file data/users.json store; only safe with a single worker."""
+
+    def __init__(self, path: Path = USERS_PATH):
+        self.path = Path(path)
+
+    def _load(self):
+        try:
+            if self.path.exists():
+                with open(self.path, "r", encoding="utf-8") as f:
+                    return json.load(f)
+        except Exception:
+            pass
+        return []
+
+    def _save(self, users):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(users, f)
+        tmp.replace(self.path)
+
+    @_timed("get_by_id")
+    def get_by_id(self, user_id):
+        return next((u for u in self._load() if u.get("id") == user_id), None)
+
+    @_timed("get_by_email")
+    def get_by_email(self, email):
+        email = _normalize_email(email)
+        return next((u for u in self._load() if u.get("email") == email), None)
+
+    @_timed("create")
+    def create(self, name, email, password_hash):
+        users = self._load()
+        email = _normalize_email(email)
+        if any(u.get("email") == email for u in users):
+            return None
+        user = {"id": secrets.token_hex(8), "name": name.strip(), "email": email,
+                "password": password_hash, "favorites": [], "favorites_version": 0}
+        users.append(user)
+        self._save(users)
+        return user
+
+    @_timed("set_favorites")
+    def set_favorites(self, user_id, favorites):
+        users = self._load()
+        for u in users:
+            if u.get("id") == user_id:
+                u["favorites"] = list(favorites)
+                u["favorites_version"] = u.get("favorites_version", 0) + 1
+                self._save(users)
+                return True
+        return False
+
+    @_timed("update_favorites")
+    def update_favorites(self, user_id, add=(), remove=(), base_version=None):
+        # No change log here: a client that is not on the current version gets the full list
+        users = self._load()
+        for u in users:
+            if u.get("id") == user_id:
+                version = u.get("favorites_version", 0)
+                history = [] if base_version == version else None
+                favorites, changes, update = _plan_favorites(u.get("favorites") or [], version, base_version,
+                                                             history, add, remove)
+                if changes:
+                    u["favorites"], u["favorites_version"] = favorites, update.version
+                    self._save(users)
+                return update
+        return None
+
+
+def make_user_repository() -> UserRepository:
+    backend = os.getenv("USER_BACKEND", "sqlite").strip().lower()
+    if backend == "json":
+        return JsonUserRepository()
+    return SQLiteUserRepository()